@@ -27,12 +27,71 @@ class Settings(BaseSettings):
     
     GMAIL_CREDENTIALS_FILE: str = str(get_project_root() / "credentials.json")
     GMAIL_TOKEN_FILE: str = str(get_project_root() / "token.json")
+    GMAIL_TOKEN_REFRESH_MARGIN_SECONDS: int = 300
+    GMAIL_QUOTA_UNITS_PER_SECOND: float = 250.0
+    GMAIL_QUOTA_BURST: int = 250
+    GMAIL_QUOTA_MAX_RETRIES: int = 5
+    GMAIL_QUOTA_BACKOFF_BASE: float = 1.0
+    GMAIL_QUOTA_BACKOFF_MAX: float = 60.0
     GMAIL_SCOPES: str = "https://www.googleapis.com/auth/gmail.readonly,https://www.googleapis.com/auth/gmail.modify"
     GMAIL_REDIRECT_URI: str = "http://localhost:8000/emails/oauth2callback"
     GMAIL_PUBSUB_PROJECT_ID: str = ""
     GMAIL_PUBSUB_TOPIC_ID: str = ""
     GMAIL_PUBSUB_SUBSCRIPTION_ID: str = ""
     GMAIL_WATCH_LABEL_IDS: str = "INBOX"
+    GMAIL_PUBSUB_ENABLED: bool = False
+    GMAIL_WATCH_ENABLED: bool = True
+    GMAIL_WATCH_RENEW_MARGIN_SECONDS: int = 86400
+    GMAIL_PUBSUB_MAX_MESSAGES: int = 10
+    GMAIL_PUBSUB_MAX_BYTES: int = 10 * 1024 * 1024
+    GMAIL_PUBSUB_MAX_DELIVERY_ATTEMPTS: int = 5
+    GMAIL_BATCH_SIZE: int = 50
+    GMAIL_API_BASE_URL: str = "https://gmail.googleapis.com"
+    GMAIL_ASYNC_MAX_CONNECTIONS: int = 20
+    GMAIL_ASYNC_MAX_CONCURRENCY: int = 10
+    GMAIL_ASYNC_TIMEOUT: float = 30.0
+    GMAIL_MESSAGE_CACHE_MAX_BYTES: int = 64 * 1024 * 1024
+    GMAIL_LABEL_CACHE_TTL: int = 300
+    GMAIL_AUTO_CREATE_LABELS: str = ""
+    LABEL_QUEUE_ENABLED: bool = True
+    LABEL_QUEUE_FLUSH_SIZE: int = 100
+    LABEL_QUEUE_FLUSH_INTERVAL: float = 2.0
+    LABEL_QUEUE_MAX_RETRIES: int = 5
+    LABEL_QUEUE_RETRY_BASE_DELAY: float = 1.0
+    GMAIL_HISTORY_FILE: str = str(get_project_root() / "gmail_history.json")
+    GMAIL_SYNC_FULL_RESYNC_MAX: int = 20
+    GMAIL_SYNC_MAX_ATTEMPTS: int = 5
+    ATTACHMENT_CONCURRENCY: int = 4
+    GMAIL_FETCH_FORMAT: str = "raw"
+    GMAIL_RAW_MAX_BYTES: int = 5 * 1024 * 1024
+    GMAIL_SIZE_PROBE: bool = False
+    HTML_TEXT_MAX_CHARS: int = 1000000
+    EXPORT_PAGE_SIZE: int = 100
+    BACKFILL_CHECKPOINT_FILE: str = str(get_project_root() / "backfill_checkpoint.json")
+    BACKFILL_WORKERS: int = 8
+    BACKFILL_PAGE_SIZE: int = 500
+    JOB_STORE_PATH: str = str(get_project_root() / "jobs.db")
+    JOB_WORKERS: int = 2
+    DOCUMENT_STORE_ENABLED: bool = True
+    DOCUMENT_STORE_PATH: str = str(get_project_root() / "documents.db")
+    DOCUMENT_STORE_BATCH_SIZE: int = 50
+    DOCUMENT_STORE_FLUSH_INTERVAL: float = 2.0
+    PARQUET_ENABLED: bool = False
+    PARQUET_DATASET_DIR: str = str(get_project_root() / "parquet")
+    PARQUET_FLUSH_ROWS: int = 5000
+    PARQUET_FLUSH_INTERVAL: float = 60.0
+    PARQUET_COMPACT_MIN_FILES: int = 16
+    EXPORT_CONCURRENCY: int = 4
+    EXPORT_SPOOL_MAX_BYTES: int = 8 * 1024 * 1024
+    PDF_WORKERS: int = 2
+    PDF_TIMEOUT_SECONDS: float = 30.0
+    PDF_MAX_MEMORY_MB: int = 1024
+    PDF_MAX_JOBS_PER_WORKER: int = 50
+    PDF_MAX_PAGES: int = 50
+    PDF_CACHE_DIR: str = str(get_project_root() / ".pdf_cache")
+    PDF_CACHE_MAX_BYTES: int = 512 * 1024 * 1024
+    CLASSIFICATION_RULES_FILE: str = str(Path(__file__).parent / "classification_rules.json")
+    CLASSIFICATION_RULES_RELOAD_INTERVAL: float = 5.0
     
     class Config:
         env_file = ".env"
@@ -48,6 +107,12 @@ class Settings(BaseSettings):
             return []
         return [label.strip() for label in self.GMAIL_WATCH_LABEL_IDS.split(",") if label.strip()]
     
+    @property
+    def GMAIL_AUTO_CREATE_LABELS_LIST(self) -> list:
+        if not self.GMAIL_AUTO_CREATE_LABELS:
+            return []
+        return [label.strip() for label in self.GMAIL_AUTO_CREATE_LABELS.split(",") if label.strip()]
+    
     @property
     def GMAIL_PUBSUB_TOPIC_PATH(self) -> str:
         if not self.GMAIL_PUBSUB_PROJECT_ID or not self.GMAIL_PUBSUB_TOPIC_ID:
@@ -6,6 +6,7 @@ from app.services.extraction_service import get_extraction_service
 from app.services.label_service import get_label_service
 from app.services.pdf_service import get_pdf_service
 from app.services.classification_service import get_classification_service
+from app.core.config import get_settings
 
 
 @asynccontextmanager
@@ -22,8 +23,41 @@ async def lifespan(app: FastAPI):
                 gmail_service.build_service()
             except Exception as e:
                 print(f"Error al construir servicio Gmail: {e}")
+            else:
+                from app.services.job_service import get_job_service
+                get_job_service().start()
+    
+    pubsub_worker = None
+    if get_settings().GMAIL_PUBSUB_ENABLED:
+        from app.services.pubsub_worker import get_pubsub_worker
+        try:
+            pubsub_worker = get_pubsub_worker()
+            pubsub_worker.start()
+        except Exception as e:
+            print(f"Error al iniciar el worker de Pub/Sub: {e}")
+            pubsub_worker = None
     
     yield
+    
+    if pubsub_worker:
+        pubsub_worker.stop()
+    
+    from app.services.job_service import get_job_service
+    get_job_service().stop()
+    
+    from app.services.label_queue import get_label_queue
+    get_label_queue().stop()
+    
+    from app.services.parquet_sink import get_parquet_sink
+    from app.services.document_store import get_document_store
+    get_parquet_sink().flush()
+    get_document_store().flush()
+    get_extraction_service().shutdown()
+    get_pdf_service().shutdown()
+    
+    from app.services.async_gmail_service import get_async_gmail_service
+    await get_async_gmail_service().close()
+    gmail_service.stop_refresh()
 
 
 app = FastAPI(
@@ -1,12 +1,20 @@
-﻿from fastapi import APIRouter, HTTPException, Request
-from fastapi.responses import JSONResponse, Response
+﻿from fastapi import APIRouter, HTTPException, Query, Request
+from fastapi.responses import JSONResponse, StreamingResponse
 from app.services.gmail_service import get_gmail_service
+from app.services.async_gmail_service import get_async_gmail_service
 from app.services.extraction_service import get_extraction_service
+from app.services.pdf_service import get_pdf_service
 from app.services.label_service import get_label_service
-import json
-import csv
-import io
-import zipfile
+from app.services.label_queue import get_label_queue
+from app.services.processing_service import get_processing_service
+from app.services.export_service import get_export_service, build_query
+from app.services.parquet_sink import get_parquet_sink
+from app.services.document_store import get_document_store
+from app.services.job_service import get_job_service
+from app.services.quota_scheduler import get_quota_scheduler
+from datetime import date, datetime, timedelta
+from typing import Optional
+import asyncio
 
 router = APIRouter(prefix="/emails", tags=["emails"])
 _oauth_flows = {}
@@ -69,10 +77,11 @@ async def oauth2_callback(request: Request):
                 )
         
         gmail_service = get_gmail_service()
-        success = gmail_service.authenticate_with_code(code, flow)
+        success = await asyncio.to_thread(gmail_service.authenticate_with_code, code, flow)
         _oauth_flows.pop(flow_key, None)
         
         if success:
+            await asyncio.to_thread(get_job_service().start)
             return JSONResponse(
                 content={
                     "status": "success",
@@ -88,126 +97,129 @@ async def oauth2_callback(request: Request):
 
 
 @router.get("/ping")
-def ping():
+async def ping():
     try:
         gmail_service = get_gmail_service()
         
-        if not gmail_service.is_authenticated():
+        if not await asyncio.to_thread(gmail_service.is_authenticated):
             raise HTTPException(
                 status_code=401,
                 detail="No autenticado. Por favor inicia sesión primero en /emails/auth/login"
             )
-        result = gmail_service.test_connection()
-        if result.get("status") == "error":
-            raise HTTPException(status_code=500, detail=result.get("message"))
-        return result
+        profile = await get_async_gmail_service().get_profile()
+        return {
+            "status": "success",
+            "email": profile.get('emailAddress'),
+            "total_messages": profile.get('messagesTotal'),
+            "total_threads": profile.get('threadsTotal')
+        }
     except HTTPException:
         raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al probar conexión: {str(e)}")
 
 
+@router.get("/messages/cache")
+def message_cache_stats():
+    return get_gmail_service().message_cache.get_stats()
+
+
+@router.get("/pdfs/cache")
+def pdf_cache_stats():
+    return get_pdf_service().cache.get_stats()
+
+
+@router.get("/pdfs/pool")
+def pdf_pool_stats():
+    pool = get_pdf_service().pool
+    return pool.get_stats() if pool else {"workers": 0}
+
+
+@router.get("/quota")
+def quota_stats():
+    return get_quota_scheduler().get_stats()
+
+
+@router.get("/labels/stats")
+def label_cache_stats():
+    return get_label_service().get_cache_stats()
+
+
+@router.get("/labels/queue")
+def label_queue_stats():
+    return get_label_queue().get_stats()
+
+
+@router.get("/documents")
+def list_documents(tipo: Optional[str] = None, desde: Optional[date] = None, hasta: Optional[date] = None,
+                   correo: Optional[str] = None, limit: int = Query(50, ge=1, le=500), offset: int = Query(0, ge=0)):
+    try:
+        return get_document_store().query(
+            tipo=tipo,
+            desde=desde.isoformat() if desde else None,
+            hasta=(hasta + timedelta(days=1)).isoformat() if hasta else None,
+            correo=correo,
+            limit=limit,
+            offset=offset
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al consultar documentos: {str(e)}")
+
+
+@router.get("/documents/stats")
+def document_store_stats():
+    return get_document_store().get_stats()
+
+
+@router.get("/documents/{message_id}")
+def get_document(message_id: str):
+    document = get_document_store().get(message_id)
+    if document is None:
+        raise HTTPException(status_code=404, detail=f"No hay un documento guardado para el mensaje {message_id}")
+    return document
+
+
+@router.get("/parquet")
+def parquet_stats():
+    return get_parquet_sink().get_stats()
+
+
 @router.get("/analyze")
-def analyze_emails(debug: bool = False, download: bool = True):
+async def analyze_emails(debug: bool = False, download: bool = True):
     try:
         gmail_service = get_gmail_service()
         
-        if not gmail_service.is_authenticated():
+        if not await asyncio.to_thread(gmail_service.is_authenticated):
             raise HTTPException(
                 status_code=401,
                 detail="No autenticado. Por favor inicia sesión primero en /emails/auth/login"
             )
         
         if not gmail_service.service:
-            gmail_service.build_service()
-        
-        results = gmail_service.service.users().messages().list(
-            userId='me',
-            maxResults=20
-        ).execute()
+            await asyncio.to_thread(gmail_service.build_service)
         
-        messages = results.get('messages', [])
-        if not messages:
+        outcome = await get_processing_service().process_new_messages_async(debug=debug)
+        if not outcome['message_ids']:
             raise HTTPException(
                 status_code=404,
-                detail="No se encontraron correos"
+                detail="No se encontraron correos nuevos desde el último análisis"
             )
         
-        all_messages = []
-        for msg in messages:
-            msg_detail = gmail_service.service.users().messages().get(
-                userId='me',
-                id=msg['id'],
-                format='metadata',
-                metadataHeaders=['Date']
-            ).execute()
-            all_messages.append({
-                'id': msg['id'],
-                'internalDate': int(msg_detail.get('internalDate', 0))
-            })
-        
-        all_messages.sort(key=lambda x: x['internalDate'], reverse=True)
-        latest_message_id = all_messages[0]['id']
-        extraction_service = get_extraction_service()
-        result = extraction_service.extract_structured_data(latest_message_id, debug=debug)
-        tipo_documento = result.get('tipo_documento', '').upper()
-        if tipo_documento in ['PO', 'QUOTE']:
-            try:
-                label_service = get_label_service()
-                label_service.apply_label_to_message(latest_message_id, tipo_documento)
-            except Exception:
-                pass
+        processed_ids = [mid for mid in outcome['message_ids'] if mid in outcome['results']]
+        if not processed_ids:
+            raise HTTPException(
+                status_code=500,
+                detail="No se pudo procesar ninguno de los correos nuevos"
+            )
         
-        result.pop('etiqueta_aplicada', None)
-        result.pop('error_etiqueta', None)
-        result.pop('email_json', None)
+        latest_message_id = processed_ids[0]
+        result = outcome['results'][latest_message_id]
         
         if not download:
             return JSONResponse(content=result)
         
-        json_str = json.dumps(result, indent=2, ensure_ascii=False)
-        
-        csv_output = io.StringIO()
-        csv_writer = csv.writer(csv_output)
-        
-        csv_writer.writerow(['tipo_documento', result.get('tipo_documento', '')])
-        csv_writer.writerow(['correo', result.get('correo', '')])
-        csv_writer.writerow(['asunto', result.get('asunto', '')])
-        csv_writer.writerow(['fecha', result.get('fecha', '')])
-        csv_writer.writerow(['total', result.get('totales', {}).get('total', '')])
-        csv_writer.writerow(['moneda', result.get('totales', {}).get('moneda', '')])
-        csv_writer.writerow([])
-        
-        csv_writer.writerow(['Productos'])
-        csv_writer.writerow(['nombre', 'cantidad', 'precio_unitario', 'total'])
-        for producto in result.get('productos', []):
-            csv_writer.writerow([
-                producto.get('nombre', ''),
-                producto.get('cantidad', ''),
-                producto.get('precio_unitario', ''),
-                producto.get('total', '')
-            ])
-        
-        csv_writer.writerow([])
-        csv_writer.writerow(['Adjuntos'])
-        csv_writer.writerow(['nombre', 'tipo'])
-        for adjunto in result.get('adjuntos', []):
-            csv_writer.writerow([
-                adjunto.get('nombre', ''),
-                adjunto.get('tipo', '')
-            ])
-        
-        csv_str = csv_output.getvalue()
-        
-        zip_buffer = io.BytesIO()
-        with zipfile.ZipFile(zip_buffer, 'w', zipfile.ZIP_DEFLATED) as zip_file:
-            zip_file.writestr(f'analisis_{latest_message_id}.json', json_str.encode('utf-8'))
-            zip_file.writestr(f'analisis_{latest_message_id}.csv', csv_str.encode('utf-8'))
-        
-        zip_buffer.seek(0)
-        
-        return Response(
-            content=zip_buffer.getvalue(),
+        return StreamingResponse(
+            get_export_service().single_message_zip(latest_message_id, result),
             media_type="application/zip",
             headers={
                 "Content-Disposition": f'attachment; filename="analisis_{latest_message_id}.zip"',
@@ -220,3 +232,109 @@ def analyze_emails(debug: bool = False, download: bool = True):
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error al analizar correo: {str(e)}")
+
+
+@router.post("/analyze/jobs", status_code=202)
+async def create_analysis_job(q: Optional[str] = None, after: Optional[date] = None, before: Optional[date] = None,
+                              max_results: int = Query(0, ge=0), debug: bool = False):
+    try:
+        gmail_service = get_gmail_service()
+        
+        if not await asyncio.to_thread(gmail_service.is_authenticated):
+            raise HTTPException(
+                status_code=401,
+                detail="No autenticado. Por favor inicia sesión primero en /emails/auth/login"
+            )
+        
+        if after and before and after >= before:
+            raise HTTPException(status_code=400, detail="La fecha 'after' debe ser anterior a 'before'")
+        
+        query = build_query(q or "", after, before) if (q or after or before) else None
+        return await asyncio.to_thread(get_job_service().submit, query, max_results, debug)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al crear el trabajo de análisis: {str(e)}")
+
+
+@router.get("/jobs")
+def list_jobs(status: Optional[str] = None, limit: int = Query(50, ge=1, le=500)):
+    return get_job_service().store.list(status=status, limit=limit)
+
+
+@router.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    job = get_job_service().store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No existe el trabajo {job_id}")
+    return job
+
+
+@router.delete("/jobs/{job_id}")
+def cancel_job(job_id: str):
+    job_service = get_job_service()
+    job = job_service.store.get(job_id, include_results=False)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"No existe el trabajo {job_id}")
+    if not job_service.cancel(job_id):
+        raise HTTPException(status_code=409, detail=f"El trabajo {job_id} ya terminó con estado {job['status']}")
+    return job_service.store.get(job_id, include_results=False)
+
+
+@router.get("/export")
+def export_emails(q: str = "", after: Optional[date] = None, before: Optional[date] = None, max_results: int = 0):
+    try:
+        gmail_service = get_gmail_service()
+        
+        if not gmail_service.is_authenticated():
+            raise HTTPException(
+                status_code=401,
+                detail="No autenticado. Por favor inicia sesión primero en /emails/auth/login"
+            )
+        
+        if after and before and after >= before:
+            raise HTTPException(status_code=400, detail="La fecha 'after' debe ser anterior a 'before'")
+        
+        query = build_query(q, after, before)
+        filename = f"exportacion_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+        return StreamingResponse(
+            get_export_service().export(query, max_results=max_results),
+            media_type="application/zip",
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+            }
+        )
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al exportar correos: {str(e)}")
+
+
+@router.get("/{message_id}/classify")
+async def classify_email(message_id: str):
+    try:
+        gmail_service = get_gmail_service()
+        
+        if not await asyncio.to_thread(gmail_service.is_authenticated):
+            raise HTTPException(
+                status_code=401,
+                detail="No autenticado. Por favor inicia sesión primero en /emails/auth/login"
+            )
+        
+        extraction_service = get_extraction_service()
+        async_gmail = get_async_gmail_service()
+        size = None
+        if extraction_service.needs_size_probe(message_id):
+            size = (await async_gmail.get_message_json(message_id, format='minimal')).get('sizeEstimate')
+        message = await async_gmail.get_message_json(
+            message_id, format=extraction_service.message_format(message_id, size=size, probe=False)
+        )
+        return await asyncio.to_thread(extraction_service.classify_message, message_id, message)
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error al clasificar correo: {str(e)}")
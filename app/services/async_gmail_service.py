@@ -0,0 +1,197 @@
+import asyncio
+import base64
+import weakref
+from typing import Optional, Dict, Any, List
+import httpx
+
+from app.core.config import get_settings
+from app.services.gmail_service import get_gmail_service
+from app.services.message_cache import cache_format
+from app.services.quota_scheduler import get_quota_scheduler, quota_cost, is_rate_limited
+
+
+class AsyncGmailError(Exception):
+    def __init__(self, status_code: int, message: str):
+        super().__init__(f"Error {status_code} de la API de Gmail: {message}")
+        self.status_code = status_code
+
+
+class _LoopResources:
+    def __init__(self, client: httpx.AsyncClient, max_concurrency: int):
+        self.client = client
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.refresh_lock = asyncio.Lock()
+
+
+class AsyncGmailService:
+    def __init__(self):
+        self.settings = get_settings()
+        self.gmail_service = get_gmail_service()
+        self.quota = get_quota_scheduler()
+        self._loops: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopResources]" = weakref.WeakKeyDictionary()
+
+    def _create_client(self) -> httpx.AsyncClient:
+        return httpx.AsyncClient(
+            base_url=self.settings.GMAIL_API_BASE_URL,
+            timeout=self.settings.GMAIL_ASYNC_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=self.settings.GMAIL_ASYNC_MAX_CONNECTIONS,
+                max_keepalive_connections=self.settings.GMAIL_ASYNC_MAX_CONNECTIONS
+            )
+        )
+
+    def _resources(self) -> _LoopResources:
+        loop = asyncio.get_running_loop()
+        resources = self._loops.get(loop)
+        if resources is None or resources.client.is_closed:
+            resources = _LoopResources(self._create_client(), self.settings.GMAIL_ASYNC_MAX_CONCURRENCY)
+            self._loops[loop] = resources
+        return resources
+
+    async def _access_token(self, stale_token: Optional[str] = None) -> str:
+        creds = self.gmail_service.creds
+        if creds and creds.valid and creds.token != stale_token:
+            return creds.token
+
+        async with self._resources().refresh_lock:
+            if self.gmail_service.creds is None:
+                await asyncio.to_thread(self.gmail_service.load_credentials)
+            creds = self.gmail_service.creds
+            if creds and creds.valid and creds.token != stale_token:
+                return creds.token
+            if not creds or not creds.refresh_token:
+                raise ValueError("No autenticado. Por favor autentícate primero.")
+            if not await asyncio.to_thread(self.gmail_service.refresh_credentials, stale_token):
+                raise ValueError("No se pudieron renovar las credenciales de Gmail")
+            return self.gmail_service.creds.token
+
+    @staticmethod
+    def _method_id(method: str, path: str) -> str:
+        parts = path.split('/')
+        if parts[0] != 'messages' or len(parts) == 1:
+            resource = {'profile': 'getProfile', 'labels': 'labels.list', 'messages': 'messages.list'}.get(parts[0], parts[0])
+            return f"gmail.users.{resource}"
+        if parts[1] == 'batchModify':
+            return "gmail.users.messages.batchModify"
+        if len(parts) >= 3 and parts[2] == 'attachments':
+            return "gmail.users.messages.attachments.get"
+        if len(parts) >= 3:
+            return f"gmail.users.messages.{parts[2]}"
+        return "gmail.users.messages.get" if method == "GET" else "gmail.users.messages.modify"
+
+    async def _send(self, method: str, url: str, params: Optional[Dict[str, Any]],
+                    json: Optional[Dict[str, Any]]) -> httpx.Response:
+        resources = self._resources()
+        client = resources.client
+        async with resources.semaphore:
+            token = await self._access_token()
+            response = await client.request(
+                method, url, params=params, json=json,
+                headers={"Authorization": f"Bearer {token}"}
+            )
+            if response.status_code == 401:
+                token = await self._access_token(stale_token=token)
+                response = await client.request(
+                    method, url, params=params, json=json,
+                    headers={"Authorization": f"Bearer {token}"}
+                )
+        return response
+
+    async def _request(self, method: str, path: str, params: Optional[Dict[str, Any]] = None,
+                       json: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        url = f"/gmail/v1/users/me/{path}"
+        method_id = self._method_id(method, path)
+        cost = quota_cost(method_id)
+
+        attempt = 0
+        while True:
+            await self.quota.acquire_async(cost)
+            response = await self._send(method, url, params, json)
+            if not is_rate_limited(response.status_code, response.content) or attempt >= self.quota.max_retries:
+                break
+            attempt += 1
+            delay = self.quota.backoff()
+            print(f"Límite de cuota de Gmail alcanzado en {method_id}, reintento {attempt} en {delay:.1f}s")
+
+        if response.status_code >= 400:
+            try:
+                message = response.json().get('error', {}).get('message', response.text)
+            except ValueError:
+                message = response.text
+            raise AsyncGmailError(response.status_code, message)
+        self.quota.succeeded()
+        return response.json() if response.content else {}
+
+    async def get_profile(self) -> Dict[str, Any]:
+        return await self._request("GET", "profile")
+
+    async def get_messages(self, max_results: int = 10, query: str = "") -> list:
+        params = {"maxResults": max_results}
+        if query:
+            params["q"] = query
+        response = await self._request("GET", "messages", params=params)
+        return response.get('messages', [])
+
+    async def get_message_json(self, message_id: str, format: str = 'full',
+                               metadata_headers: Optional[List[str]] = None) -> Dict[str, Any]:
+        key_format = cache_format(format, metadata_headers)
+        cached = self.gmail_service.message_cache.get(message_id, key_format)
+        if cached is not None:
+            return cached
+
+        params: Dict[str, Any] = {"format": format}
+        if metadata_headers:
+            params["metadataHeaders"] = metadata_headers
+        message = await self._request("GET", f"messages/{message_id}", params=params)
+        self.gmail_service.message_cache.put(message_id, key_format, message)
+        return message
+
+    async def get_messages_json(self, message_ids: List[str], format: str = 'full',
+                                metadata_headers: Optional[List[str]] = None) -> Dict[str, Dict[str, Any]]:
+        message_ids = list(dict.fromkeys(message_ids))
+
+        async def fetch(message_id: str) -> Dict[str, Any]:
+            try:
+                return {"response": await self.get_message_json(message_id, format, metadata_headers)}
+            except Exception as e:
+                return {"error": str(e)}
+
+        results = await asyncio.gather(*(fetch(message_id) for message_id in message_ids))
+        return dict(zip(message_ids, results))
+
+    async def get_attachment(self, message_id: str, attachment_id: str) -> bytes:
+        attachment = await self._request("GET", f"messages/{message_id}/attachments/{attachment_id}")
+        return base64.urlsafe_b64decode(attachment['data'])
+
+    async def list_labels(self) -> List[Dict[str, Any]]:
+        response = await self._request("GET", "labels")
+        return response.get('labels', [])
+
+    async def modify_message(self, message_id: str, add_label_ids: List[str], remove_label_ids: List[str]) -> Dict[str, Any]:
+        response = await self._request(
+            "POST", f"messages/{message_id}/modify",
+            json={"addLabelIds": add_label_ids, "removeLabelIds": remove_label_ids}
+        )
+        self.gmail_service.message_cache.invalidate([message_id])
+        return response
+
+    async def batch_modify_messages(self, message_ids: List[str], add_label_ids: List[str], remove_label_ids: List[str]):
+        await self._request(
+            "POST", "messages/batchModify",
+            json={"ids": message_ids, "addLabelIds": add_label_ids, "removeLabelIds": remove_label_ids}
+        )
+        self.gmail_service.message_cache.invalidate(message_ids)
+
+    async def close(self):
+        resources = self._loops.pop(asyncio.get_running_loop(), None)
+        if resources is not None:
+            await resources.client.aclose()
+
+
+_async_gmail_service_instance: Optional[AsyncGmailService] = None
+
+def get_async_gmail_service() -> AsyncGmailService:
+    global _async_gmail_service_instance
+    if _async_gmail_service_instance is None:
+        _async_gmail_service_instance = AsyncGmailService()
+    return _async_gmail_service_instance
@@ -0,0 +1,189 @@
+import os
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+from app.core.config import get_settings
+from app.services.gmail_service import get_gmail_service
+from app.services.extraction_service import get_extraction_service
+from app.services.processing_service import get_processing_service
+from app.services.label_queue import get_label_queue
+from app.services.parquet_sink import get_parquet_sink
+from app.services.quota_scheduler import quota_priority, PRIORITY_BACKGROUND
+
+MAX_STORED_ERRORS = 1000
+
+
+def _format_duration(seconds: float) -> str:
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    return f"{hours:d}h{minutes:02d}m{seconds:02d}s"
+
+
+class BackfillService:
+    def __init__(self, checkpoint_file: Optional[str] = None):
+        self.settings = get_settings()
+        self.checkpoint_file = checkpoint_file or self.settings.BACKFILL_CHECKPOINT_FILE
+        self.gmail_service = get_gmail_service()
+        self.extraction_service = get_extraction_service()
+        self.processing_service = get_processing_service()
+        self.label_queue = get_label_queue()
+        self.parquet_sink = get_parquet_sink()
+
+    def _new_state(self, query: str) -> Dict[str, Any]:
+        return {
+            "query": query,
+            "page_token": None,
+            "page_index": 0,
+            "completed": [],
+            "processed": 0,
+            "failed": 0,
+            "errors": {},
+            "result_size_estimate": 0,
+            "done": False,
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "updated_at": None
+        }
+
+    def load_checkpoint(self, query: str, reset: bool = False) -> Dict[str, Any]:
+        if reset or not os.path.isfile(self.checkpoint_file):
+            return self._new_state(query)
+
+        with open(self.checkpoint_file, encoding='utf-8') as checkpoint:
+            state = json.load(checkpoint)
+        if state.get('query') != query:
+            raise ValueError(
+                f"El checkpoint {self.checkpoint_file} es de la búsqueda '{state.get('query')}'. "
+                "Usa --reset para empezar una nueva o --checkpoint para otro archivo."
+            )
+        return state
+
+    def save_checkpoint(self, state: Dict[str, Any]):
+        state['updated_at'] = datetime.now(timezone.utc).isoformat()
+        checkpoint_dir = os.path.dirname(self.checkpoint_file)
+        if checkpoint_dir:
+            os.makedirs(checkpoint_dir, exist_ok=True)
+
+        tmp_path = f"{self.checkpoint_file}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as checkpoint:
+            json.dump(state, checkpoint, ensure_ascii=False)
+            checkpoint.flush()
+            os.fsync(checkpoint.fileno())
+        os.replace(tmp_path, self.checkpoint_file)
+
+    def _process(self, message_id: str, apply_labels: bool) -> Optional[str]:
+        try:
+            with quota_priority(PRIORITY_BACKGROUND):
+                if apply_labels:
+                    self.processing_service.process_message(message_id)
+                else:
+                    self.extraction_service.extract_structured_data(message_id)
+            return None
+        except Exception as e:
+            return str(e)
+
+    def _report(self, state: Dict[str, Any], started: float, processed_at_start: int):
+        elapsed = time.monotonic() - started
+        done_now = state['processed'] - processed_at_start
+        rate = done_now / elapsed if elapsed > 0 else 0.0
+        estimate = state['result_size_estimate']
+        line = f"Procesados {state['processed']}"
+        if estimate:
+            line += f" de ~{estimate}"
+        line += f" ({state['failed']} con error), {rate:.1f} msg/s"
+        if rate > 0 and estimate > state['processed']:
+            line += f", ETA {_format_duration((estimate - state['processed']) / rate)}"
+        print(line, flush=True)
+
+    def run(self, query: str, workers: Optional[int] = None, page_size: Optional[int] = None,
+            max_messages: int = 0, apply_labels: bool = True, reset: bool = False,
+            progress_interval: float = 10.0) -> Dict[str, Any]:
+        workers = workers or self.settings.BACKFILL_WORKERS
+        page_size = min(page_size or self.settings.BACKFILL_PAGE_SIZE, 500)
+        state = self.load_checkpoint(query, reset)
+        if state['done']:
+            print(f"La búsqueda '{query}' ya se completó ({state['processed']} mensajes). Usa --reset para repetirla.")
+            return state
+
+        started = time.monotonic()
+        processed_at_start = state['processed']
+        last_report = last_save = started
+        print(f"Backfill de '{query}' con {workers} workers, retomando en la página {state['page_index']} "
+              f"({state['processed']} mensajes ya procesados)", flush=True)
+
+        if apply_labels:
+            self.label_queue.start()
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="backfill")
+        try:
+            while True:
+                with quota_priority(PRIORITY_BACKGROUND):
+                    page = self.gmail_service.list_message_page(query, state['page_token'], page_size)
+                state['result_size_estimate'] = max(
+                    state['result_size_estimate'], page['result_size_estimate'], state['processed']
+                )
+                completed = set(state['completed'])
+                pending = [message_id for message_id in page['message_ids'] if message_id not in completed]
+                limited = False
+                if max_messages:
+                    remaining = max(0, max_messages - (state['processed'] - processed_at_start))
+                    limited = len(pending) > remaining
+                    pending = pending[:remaining]
+
+                futures = {executor.submit(self._process, message_id, apply_labels): message_id for message_id in pending}
+                for future in as_completed(futures):
+                    message_id = futures[future]
+                    error = future.result()
+                    state['completed'].append(message_id)
+                    state['processed'] += 1
+                    if error is not None:
+                        state['failed'] += 1
+                        if len(state['errors']) < MAX_STORED_ERRORS:
+                            state['errors'][message_id] = error
+
+                    now = time.monotonic()
+                    if now - last_save >= 2.0:
+                        self.save_checkpoint(state)
+                        last_save = now
+                    if now - last_report >= progress_interval:
+                        self._report(state, started, processed_at_start)
+                        last_report = now
+
+                if limited:
+                    self.save_checkpoint(state)
+                    break
+
+                state['page_token'] = page['next_page_token']
+                state['page_index'] += 1
+                state['completed'] = []
+                if not state['page_token']:
+                    state['done'] = True
+                    self.save_checkpoint(state)
+                    break
+                self.save_checkpoint(state)
+        except KeyboardInterrupt:
+            print("Backfill interrumpido; guardando el checkpoint para retomarlo después", flush=True)
+            executor.shutdown(wait=False, cancel_futures=True)
+            self.save_checkpoint(state)
+            raise
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            if apply_labels:
+                self.label_queue.stop()
+            self.extraction_service.document_store.flush()
+            self.parquet_sink.flush()
+
+        self._report(state, started, processed_at_start)
+        elapsed = time.monotonic() - started
+        print(f"Backfill {'completado' if state['done'] else 'pausado'} en {_format_duration(elapsed)}", flush=True)
+        return state
+
+
+_backfill_service_instance: Optional[BackfillService] = None
+
+def get_backfill_service() -> BackfillService:
+    global _backfill_service_instance
+    if _backfill_service_instance is None:
+        _backfill_service_instance = BackfillService()
+    return _backfill_service_instance
@@ -0,0 +1,187 @@
+import re
+from typing import Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+_NUMBERED_LINE_RE = re.compile(r'^[^\d\n]*\d+[^\d\n]+\d', re.MULTILINE)
+_TABLE_KEYWORD_RE = re.compile(
+    r'(?:item|producto|description|descripci[oó]n|art[ií]culo|total|iva|tax|shipping|env[ií]o)[^\n]*'
+)
+_AMOUNT_HIT_RES = {
+    'code': re.compile(r'usd|eur|gbp|mxn|cop|ars|clp|pen|brl', re.IGNORECASE),
+    'label': re.compile(r'currency|moneda|divisa', re.IGNORECASE),
+    'dollar': re.compile(r'\$'),
+    'total': re.compile(r'total', re.IGNORECASE),
+    'lead': re.compile(r'grand|amount|monto|net|final', re.IGNORECASE),
+}
+AMOUNT_HIT_MAX_LENGTH = 8
+
+
+def _line_indexes(text: str, pattern: "re.Pattern") -> List[int]:
+    indexes: List[int] = []
+    line, previous = 0, 0
+    for match in pattern.finditer(text):
+        position = match.start()
+        line += text.count('\n', previous, position)
+        previous = position
+        if not indexes or indexes[-1] != line:
+            indexes.append(line)
+    return indexes
+
+
+class TextFeatures:
+    def __init__(self, text: str):
+        self.text = text
+        self._lines: Optional[List[str]] = None
+        self._amount_hits: Dict[str, List[int]] = {}
+        self._amount_sources: Dict[str, Iterator[int]] = {}
+        self._amount_scanned: Dict[str, Optional[int]] = {}
+        self._lower: Optional[str] = None
+        self._lower_lines: Optional[List[str]] = None
+        self._keyword_lines: Optional[Set[int]] = None
+        self._candidate_lines: Optional[List[int]] = None
+
+    @property
+    def lines(self) -> List[str]:
+        if self._lines is None:
+            self._lines = self.text.split('\n')
+        return self._lines
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+    @property
+    def lower_lines(self) -> List[str]:
+        if self._lower_lines is None:
+            self._lower_lines = self.lower.split('\n')
+        return self._lower_lines
+
+    @property
+    def keyword_lines(self) -> Set[int]:
+        if self._keyword_lines is None:
+            self._keyword_lines = set(_line_indexes(self.lower, _TABLE_KEYWORD_RE))
+        return self._keyword_lines
+
+    @property
+    def candidate_lines(self) -> List[int]:
+        if self._candidate_lines is None:
+            numbered = _line_indexes(self.lower, _NUMBERED_LINE_RE)
+            self._candidate_lines = sorted(self.keyword_lines.union(numbered))
+        return self._candidate_lines
+
+    def _next_amount_hit(self, kind: str, limit: Optional[int]) -> Optional[int]:
+        if kind == 'total_line':
+            source = self._amount_sources.get(kind)
+            if source is None:
+                source = self._amount_sources[kind] = self._total_line_starts()
+            return next(source, None)
+
+        scanned = self._amount_scanned.get(kind, 0)
+        end = len(self.text) if limit is None else min(limit, len(self.text))
+        if scanned is None or scanned >= end:
+            return None
+        match = _AMOUNT_HIT_RES[kind].search(self.text, scanned, end)
+        if match:
+            self._amount_scanned[kind] = match.start() + 1
+            return match.start()
+        self._amount_scanned[kind] = None if end == len(self.text) else max(scanned, end - AMOUNT_HIT_MAX_LENGTH + 1)
+        return None
+
+    def amount_hits(self, kind: str, limit: Optional[int] = None) -> Iterator[int]:
+        hits = self._amount_hits.setdefault(kind, [])
+        index = 0
+        while True:
+            if index == len(hits):
+                position = self._next_amount_hit(kind, limit)
+                if position is None:
+                    return
+                hits.append(position)
+            if limit is not None and hits[index] >= limit:
+                return
+            yield hits[index]
+            index += 1
+
+    def _total_line_starts(self) -> Iterator[int]:
+        line_start, scanned, checked = 0, 0, -1
+        for position in self.amount_hits('total'):
+            newline = self.text.rfind('\n', scanned, position)
+            if newline >= 0:
+                line_start = newline + 1
+            scanned = position
+            if line_start == checked:
+                continue
+            checked = line_start
+            prefix = self.text[line_start:position]
+            if not prefix or prefix.isspace():
+                yield line_start
+
+    def first_match(self, pattern: "re.Pattern", kinds: Iterable[str]) -> Optional["re.Match"]:
+        best = None
+        for kind in kinds:
+            for position in self.amount_hits(kind, best.start() if best else None):
+                match = pattern.match(self.text, position)
+                if match:
+                    best = match
+                    break
+        return best
+
+
+class DocumentFeatures:
+    def __init__(self, subject: str, body: str, pdf_texts: Optional[List[str]] = None, body_lines: str = ""):
+        self.subject = subject
+        self.body = body
+        self.pdf_texts = list(pdf_texts or [])
+        self.pdf_text = ' '.join(self.pdf_texts)
+        self.body_lines = body_lines
+        self._upper: Dict[str, str] = {}
+        self._rules = None
+        self._hits: Dict[Tuple[str, str], bool] = {}
+        self._combined: Optional[str] = None
+        self._pdf_features: Optional[List[TextFeatures]] = None
+        self._body_line_features: Optional[TextFeatures] = None
+        self._combined_features: Optional[TextFeatures] = None
+
+    def upper(self, segment: str) -> str:
+        value = self._upper.get(segment)
+        if value is None:
+            if segment == 'combined':
+                value = f"{self.upper('subject')} {self.upper('body')} {self.upper('pdf')}"
+            else:
+                value = {'subject': self.subject, 'body': self.body, 'pdf': self.pdf_text}[segment].upper()
+            self._upper[segment] = value
+        return value
+
+    def search(self, rules, family: str, segment: str) -> bool:
+        if rules is not self._rules:
+            self._rules = rules
+            self._hits = {}
+        key = (family, segment)
+        hit = self._hits.get(key)
+        if hit is None:
+            hit = self._hits[key] = rules.search(family, self.upper(segment))
+        return hit
+
+    @property
+    def combined(self) -> str:
+        if self._combined is None:
+            self._combined = f"{self.subject} {self.body} {self.pdf_text}"
+        return self._combined
+
+    @property
+    def pdf_features(self) -> List[TextFeatures]:
+        if self._pdf_features is None:
+            self._pdf_features = [TextFeatures(text) for text in self.pdf_texts]
+        return self._pdf_features
+
+    @property
+    def body_line_features(self) -> TextFeatures:
+        if self._body_line_features is None:
+            self._body_line_features = TextFeatures(self.body_lines)
+        return self._body_line_features
+
+    @property
+    def combined_features(self) -> TextFeatures:
+        if self._combined_features is None:
+            self._combined_features = TextFeatures(self.combined)
+        return self._combined_features
@@ -0,0 +1,312 @@
+import os
+import copy
+import json
+import time
+import atexit
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import get_settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    message_id TEXT PRIMARY KEY,
+    tipo_documento TEXT NOT NULL,
+    correo TEXT,
+    asunto TEXT,
+    fecha TEXT,
+    total REAL,
+    moneda TEXT,
+    rules_version INTEGER NOT NULL,
+    extracted_at TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS productos (
+    message_id TEXT NOT NULL REFERENCES documents(message_id) ON DELETE CASCADE,
+    linea INTEGER NOT NULL,
+    nombre TEXT,
+    cantidad INTEGER,
+    precio_unitario REAL,
+    total REAL,
+    PRIMARY KEY (message_id, linea)
+);
+CREATE TABLE IF NOT EXISTS adjuntos (
+    message_id TEXT NOT NULL REFERENCES documents(message_id) ON DELETE CASCADE,
+    posicion INTEGER NOT NULL,
+    nombre TEXT,
+    tipo TEXT,
+    PRIMARY KEY (message_id, posicion)
+);
+CREATE TABLE IF NOT EXISTS failures (
+    message_id TEXT PRIMARY KEY,
+    attempts INTEGER NOT NULL,
+    last_error TEXT,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_documents_tipo_fecha ON documents (tipo_documento, fecha);
+CREATE INDEX IF NOT EXISTS idx_documents_fecha ON documents (fecha);
+CREATE INDEX IF NOT EXISTS idx_documents_correo_fecha ON documents (correo, fecha);
+"""
+
+
+def normalize_fecha(fecha: str) -> Optional[str]:
+    try:
+        parsed = datetime.fromisoformat(fecha)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).strftime('%Y-%m-%dT%H:%M:%S')
+
+
+class DocumentStore:
+    def __init__(self, db_path: str, batch_size: int = 50, flush_interval: float = 2.0):
+        self.db_path = db_path
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._flushing: Dict[str, Tuple[int, Dict[str, Any]]] = {}
+        self._failures: Dict[str, Tuple[int, str]] = {}
+        self._last_flush = time.monotonic()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.enabled = bool(db_path)
+        if self.enabled:
+            db_dir = os.path.dirname(db_path)
+            if db_dir:
+                os.makedirs(db_dir, exist_ok=True)
+            self._connection().executescript(SCHEMA)
+            atexit.register(self.flush)
+            if self.flush_interval > 0:
+                threading.Thread(target=self._flush_periodically, name="document-store-flush", daemon=True).start()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    def get(self, message_id: str, rules_version: Optional[int] = None) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            pending = self._pending.get(message_id) or self._flushing.get(message_id)
+        if pending is not None:
+            version, document = pending[0], copy.deepcopy(pending[1])
+        else:
+            row = self._connection().execute(
+                "SELECT rules_version, data FROM documents WHERE message_id = ?", (message_id,)
+            ).fetchone()
+            version, document = (row["rules_version"], json.loads(row["data"])) if row else (None, None)
+
+        if document is None or (rules_version is not None and version != rules_version):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return document
+
+    def contains(self, message_id: str, rules_version: Optional[int] = None) -> bool:
+        if not self.enabled:
+            return False
+        with self._lock:
+            pending = self._pending.get(message_id) or self._flushing.get(message_id)
+        if pending is not None:
+            return rules_version is None or pending[0] == rules_version
+        row = self._connection().execute(
+            "SELECT rules_version FROM documents WHERE message_id = ?", (message_id,)
+        ).fetchone()
+        return row is not None and (rules_version is None or row["rules_version"] == rules_version)
+
+    def save(self, message_id: str, document: Dict[str, Any], rules_version: int = 0):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._pending[message_id] = (rules_version, copy.deepcopy(document))
+            due = (len(self._pending) >= self.batch_size
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush(wait=False)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            with self._lock:
+                due = bool(self._pending) and time.monotonic() - self._last_flush >= self.flush_interval
+            if due:
+                self.flush()
+
+    def flush(self, wait: bool = True):
+        if not self.enabled:
+            return
+        if not self._flush_lock.acquire(blocking=wait):
+            return
+        try:
+            while self._flush_pending():
+                pass
+        finally:
+            self._flush_lock.release()
+
+    def _flush_pending(self) -> bool:
+        with self._lock:
+            if not self._pending:
+                return False
+            pending, self._pending = self._pending, {}
+            self._flushing = pending
+            self._last_flush = time.monotonic()
+
+        extracted_at = datetime.now(timezone.utc).isoformat()
+        documents, productos, adjuntos = [], [], []
+        for message_id, (rules_version, document) in pending.items():
+            totales = document.get('totales', {})
+            documents.append((
+                message_id,
+                document.get('tipo_documento', ''),
+                document.get('correo', ''),
+                document.get('asunto', ''),
+                normalize_fecha(document.get('fecha', '')),
+                totales.get('total'),
+                totales.get('moneda'),
+                rules_version,
+                extracted_at,
+                json.dumps(document, ensure_ascii=False)
+            ))
+            for linea, producto in enumerate(document.get('productos', []), start=1):
+                productos.append((
+                    message_id, linea, producto.get('nombre'), producto.get('cantidad'),
+                    producto.get('precio_unitario'), producto.get('total')
+                ))
+            for posicion, adjunto in enumerate(document.get('adjuntos', []), start=1):
+                adjuntos.append((message_id, posicion, adjunto.get('nombre'), adjunto.get('tipo')))
+
+        connection = self._connection()
+        try:
+            with connection:
+                connection.executemany(
+                    "DELETE FROM documents WHERE message_id = ?", [(row[0],) for row in documents]
+                )
+                connection.executemany(
+                    "INSERT INTO documents (message_id, tipo_documento, correo, asunto, fecha, total, moneda, "
+                    "rules_version, extracted_at, data) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)", documents
+                )
+                connection.executemany("INSERT INTO productos VALUES (?, ?, ?, ?, ?, ?)", productos)
+                connection.executemany("INSERT INTO adjuntos VALUES (?, ?, ?, ?)", adjuntos)
+            self.writes += len(documents)
+            return True
+        except sqlite3.Error as e:
+            print(f"Error al guardar {len(documents)} documentos en {self.db_path}: {e}")
+            with self._lock:
+                for message_id, entry in pending.items():
+                    self._pending.setdefault(message_id, entry)
+            return False
+        finally:
+            with self._lock:
+                self._flushing = {}
+
+    def query(self, tipo: Optional[str] = None, desde: Optional[str] = None, hasta: Optional[str] = None,
+              correo: Optional[str] = None, limit: int = 50, offset: int = 0) -> Dict[str, Any]:
+        if not self.enabled:
+            return {"total": 0, "limit": limit, "offset": offset, "items": []}
+        self.flush()
+
+        conditions: List[str] = []
+        params: List[Any] = []
+        if tipo:
+            conditions.append("tipo_documento = ?")
+            params.append(tipo.upper())
+        if correo:
+            conditions.append("correo = ?")
+            params.append(correo)
+        if desde:
+            conditions.append("fecha >= ?")
+            params.append(desde)
+        if hasta:
+            conditions.append("fecha < ?")
+            params.append(hasta)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        connection = self._connection()
+        total = connection.execute(f"SELECT COUNT(*) FROM documents {where}", params).fetchone()[0]
+        rows = connection.execute(
+            f"SELECT message_id, data FROM documents {where} ORDER BY fecha DESC, message_id LIMIT ? OFFSET ?",
+            params + [limit, offset]
+        ).fetchall()
+        return {
+            "total": total,
+            "limit": limit,
+            "offset": offset,
+            "items": [{"message_id": row["message_id"], **json.loads(row["data"])} for row in rows]
+        }
+
+    def record_failure(self, message_id: str, error: str) -> int:
+        if not self.enabled:
+            with self._lock:
+                attempts = self._failures.get(message_id, (0, ''))[0] + 1
+                self._failures[message_id] = (attempts, error)
+            return attempts
+
+        connection = self._connection()
+        with connection:
+            connection.execute(
+                "INSERT INTO failures (message_id, attempts, last_error, updated_at) VALUES (?, 1, ?, ?) "
+                "ON CONFLICT(message_id) DO UPDATE SET attempts = attempts + 1, "
+                "last_error = excluded.last_error, updated_at = excluded.updated_at",
+                (message_id, error, datetime.now(timezone.utc).isoformat())
+            )
+        return connection.execute(
+            "SELECT attempts FROM failures WHERE message_id = ?", (message_id,)
+        ).fetchone()["attempts"]
+
+    def clear_failures(self, message_ids: List[str]):
+        if not message_ids:
+            return
+        if not self.enabled:
+            with self._lock:
+                for message_id in message_ids:
+                    self._failures.pop(message_id, None)
+            return
+
+        connection = self._connection()
+        with connection:
+            connection.executemany("DELETE FROM failures WHERE message_id = ?", [(m,) for m in message_ids])
+
+    def failure_count(self) -> int:
+        if not self.enabled:
+            return len(self._failures)
+        return self._connection().execute("SELECT COUNT(*) FROM failures").fetchone()[0]
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "writes": self.writes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "failed_messages": self.failure_count()
+        }
+
+
+_document_store_instance: Optional[DocumentStore] = None
+
+def get_document_store() -> DocumentStore:
+    global _document_store_instance
+    if _document_store_instance is None:
+        settings = get_settings()
+        _document_store_instance = DocumentStore(
+            settings.DOCUMENT_STORE_PATH if settings.DOCUMENT_STORE_ENABLED else "",
+            batch_size=settings.DOCUMENT_STORE_BATCH_SIZE,
+            flush_interval=settings.DOCUMENT_STORE_FLUSH_INTERVAL
+        )
+    return _document_store_instance
@@ -0,0 +1,214 @@
+import io
+import csv
+import json
+import time
+import tempfile
+import zipfile
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from typing import Dict, Any, Optional, Iterator, Iterable, List, Tuple
+from app.core.config import get_settings
+from app.services.gmail_service import get_gmail_service
+from app.services.extraction_service import get_extraction_service
+from app.utils.xlsx_writer import XLSXWriter
+
+EXPORT_COLUMNS = [
+    'message_id', 'tipo_documento', 'correo', 'asunto', 'fecha', 'total', 'moneda',
+    'producto', 'cantidad', 'precio_unitario', 'total_producto'
+]
+COPY_CHUNK_SIZE = 256 * 1024
+
+
+def summary_rows(result: Dict[str, Any]) -> List[List[Any]]:
+    rows = [
+        ['tipo_documento', result.get('tipo_documento', '')],
+        ['correo', result.get('correo', '')],
+        ['asunto', result.get('asunto', '')],
+        ['fecha', result.get('fecha', '')],
+        ['total', result.get('totales', {}).get('total', '')],
+        ['moneda', result.get('totales', {}).get('moneda', '')],
+        [],
+        ['Productos'],
+        ['nombre', 'cantidad', 'precio_unitario', 'total'],
+    ]
+    for producto in result.get('productos', []):
+        rows.append([
+            producto.get('nombre', ''),
+            producto.get('cantidad', ''),
+            producto.get('precio_unitario', ''),
+            producto.get('total', '')
+        ])
+    rows.extend([[], ['Adjuntos'], ['nombre', 'tipo']])
+    for adjunto in result.get('adjuntos', []):
+        rows.append([adjunto.get('nombre', ''), adjunto.get('tipo', '')])
+    return rows
+
+
+def export_rows(message_id: str, result: Dict[str, Any]) -> Iterator[List[Any]]:
+    totales = result.get('totales', {})
+    base = [
+        message_id,
+        result.get('tipo_documento', ''),
+        result.get('correo', ''),
+        result.get('asunto', ''),
+        result.get('fecha', ''),
+        totales.get('total', ''),
+        totales.get('moneda', '')
+    ]
+    productos = result.get('productos', [])
+    if not productos:
+        yield base + ['', '', '', '']
+    for producto in productos:
+        yield base + [
+            producto.get('nombre', ''),
+            producto.get('cantidad', ''),
+            producto.get('precio_unitario', ''),
+            producto.get('total', '')
+        ]
+
+
+def build_query(query: str = "", after: Optional[date] = None, before: Optional[date] = None) -> str:
+    terms = [query.strip()] if query and query.strip() else []
+    if after:
+        terms.append(f"after:{after.strftime('%Y/%m/%d')}")
+    if before:
+        terms.append(f"before:{before.strftime('%Y/%m/%d')}")
+    return " ".join(terms)
+
+
+class ZipChunkSink:
+    def __init__(self):
+        self._chunks: List[bytes] = []
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+class ExportService:
+    def __init__(self):
+        self.settings = get_settings()
+        self.gmail_service = get_gmail_service()
+        self.extraction_service = get_extraction_service()
+
+    def iter_results(self, message_ids: Iterable[str]) -> Iterator[Tuple[str, Optional[Dict[str, Any]], Optional[str]]]:
+        window = max(1, self.settings.EXPORT_CONCURRENCY)
+        with ThreadPoolExecutor(max_workers=window, thread_name_prefix="export") as executor:
+            pending = deque()
+            for message_id in message_ids:
+                pending.append((message_id, executor.submit(self.extraction_service.extract_structured_data, message_id)))
+                if len(pending) >= window:
+                    yield self._collect(*pending.popleft())
+            while pending:
+                yield self._collect(*pending.popleft())
+
+    @staticmethod
+    def _collect(message_id: str, future) -> Tuple[str, Optional[Dict[str, Any]], Optional[str]]:
+        try:
+            return message_id, future.result(), None
+        except Exception as e:
+            print(f"Error al exportar el mensaje {message_id}: {e}")
+            return message_id, None, str(e)
+
+    def _copy_into(self, archive: zipfile.ZipFile, sink: ZipChunkSink, name: str, source,
+                   compress_type: int = zipfile.ZIP_DEFLATED) -> Iterator[bytes]:
+        source.seek(0)
+        info = zipfile.ZipInfo(name, date_time=time.localtime()[:6])
+        info.compress_type = compress_type
+        with archive.open(info, 'w', force_zip64=True) as entry:
+            while True:
+                chunk = source.read(COPY_CHUNK_SIZE)
+                if not chunk:
+                    break
+                entry.write(chunk.encode('utf-8') if isinstance(chunk, str) else chunk)
+                data = sink.drain()
+                if data:
+                    yield data
+
+    def stream_zip(self, results: Iterable[Tuple[str, Optional[Dict[str, Any]], Optional[str]]],
+                   name: str = "exportacion") -> Iterator[bytes]:
+        sink = ZipChunkSink()
+        errors = []
+        with tempfile.SpooledTemporaryFile(
+            max_size=self.settings.EXPORT_SPOOL_MAX_BYTES, mode='w+', newline='', encoding='utf-8'
+        ) as csv_file, XLSXWriter(sheet_name=name) as xlsx:
+            archive = zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED)
+            csv_writer = csv.writer(csv_file)
+            csv_writer.writerow(EXPORT_COLUMNS)
+            xlsx.write_row(EXPORT_COLUMNS)
+
+            info = zipfile.ZipInfo(f"{name}.jsonl", date_time=time.localtime()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            with archive.open(info, 'w', force_zip64=True) as json_entry:
+                for message_id, result, error in results:
+                    if error is not None:
+                        errors.append({"message_id": message_id, "error": error})
+                        continue
+                    json_entry.write(json.dumps(
+                        {"message_id": message_id, **result}, ensure_ascii=False
+                    ).encode('utf-8') + b"\n")
+                    for row in export_rows(message_id, result):
+                        csv_writer.writerow(row)
+                        xlsx.write_row(row)
+                    data = sink.drain()
+                    if data:
+                        yield data
+
+            csv_file.flush()
+            yield from self._copy_into(archive, sink, f"{name}.csv", csv_file)
+
+            with tempfile.TemporaryFile() as xlsx_file:
+                xlsx.save(xlsx_file)
+                yield from self._copy_into(archive, sink, f"{name}.xlsx", xlsx_file, zipfile.ZIP_STORED)
+
+            if errors:
+                archive.writestr("errores.json", json.dumps(errors, indent=2, ensure_ascii=False).encode('utf-8'))
+            archive.close()
+            yield sink.drain()
+
+    def export(self, query: str = "", max_results: int = 0) -> Iterator[bytes]:
+        message_ids = self.gmail_service.iter_message_ids(
+            query, page_size=self.settings.EXPORT_PAGE_SIZE, max_results=max_results
+        )
+        return self.stream_zip(self.iter_results(message_ids))
+
+    def single_message_zip(self, message_id: str, result: Dict[str, Any]) -> Iterator[bytes]:
+        sink = ZipChunkSink()
+        rows = summary_rows(result)
+        archive = zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED)
+
+        archive.writestr(
+            f'analisis_{message_id}.json',
+            json.dumps(result, indent=2, ensure_ascii=False).encode('utf-8')
+        )
+        csv_output = io.StringIO()
+        csv.writer(csv_output).writerows(rows)
+        archive.writestr(f'analisis_{message_id}.csv', csv_output.getvalue().encode('utf-8'))
+        yield sink.drain()
+
+        with XLSXWriter(sheet_name="Analisis") as xlsx, tempfile.TemporaryFile() as xlsx_file:
+            for row in rows:
+                xlsx.write_row(row)
+            xlsx.save(xlsx_file)
+            yield from self._copy_into(archive, sink, f'analisis_{message_id}.xlsx', xlsx_file, zipfile.ZIP_STORED)
+
+        archive.close()
+        yield sink.drain()
+
+
+_export_service_instance: Optional[ExportService] = None
+
+def get_export_service() -> ExportService:
+    global _export_service_instance
+    if _export_service_instance is None:
+        _export_service_instance = ExportService()
+    return _export_service_instance
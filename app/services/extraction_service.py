@@ -1,31 +1,78 @@
 import re
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 from email.utils import parsedate_to_datetime
+from app.core.config import get_settings
 from app.services.gmail_service import get_gmail_service
 from app.services.pdf_service import get_pdf_service
 from app.services.classification_service import get_classification_service
+from app.services.document_features import DocumentFeatures
+from app.services.document_store import get_document_store
 from app.utils.text_utils import clean_text, truncate_text, html_to_text
+from app.utils.mime_utils import (
+    b64url_decode, is_attachment_part, parse_raw_message, payload_text_parts, walk_payload
+)
 
 class ExtractionService:
     def __init__(self):
+        self.settings = get_settings()
         self.gmail_service = get_gmail_service()
         self.pdf_service = get_pdf_service()
         self.classification_service = get_classification_service()
+        self.document_store = get_document_store()
+        self.attachment_executor = ThreadPoolExecutor(
+            max_workers=max(1, self.settings.ATTACHMENT_CONCURRENCY),
+            thread_name_prefix="attachments"
+        )
     
-    def extract_email_info(self, message_id: str) -> Dict[str, Any]:
-        if not self.gmail_service.service:
-            self.gmail_service.build_service()
-        
-        message = self.gmail_service.service.users().messages().get(
-            userId='me', id=message_id, format='full'
-        ).execute()
+    def needs_size_probe(self, message_id: str) -> bool:
+        return (
+            self.settings.GMAIL_FETCH_FORMAT == 'raw'
+            and self.settings.GMAIL_SIZE_PROBE
+            and self.gmail_service.message_cache.size_estimate(message_id) is None
+        )
+    
+    def message_format(self, message_id: str, size: Optional[int] = None, probe: bool = True) -> str:
+        if self.settings.GMAIL_FETCH_FORMAT != 'raw':
+            return 'full'
+        if size is None:
+            size = self.gmail_service.message_cache.size_estimate(message_id)
+        if size is None and probe and self.settings.GMAIL_SIZE_PROBE:
+            size = self.gmail_service.get_message_json(message_id, format='minimal').get('sizeEstimate')
+        if size is not None and int(size) > self.settings.GMAIL_RAW_MAX_BYTES:
+            return 'full'
+        return 'raw'
+    
+    def _load_email(self, message_id: str, message: Optional[Dict[str, Any]] = None) -> Tuple[Dict[str, Any], Dict[int, bytes], str]:
+        if message is None:
+            message = self.gmail_service.get_message_json(message_id, format=self.message_format(message_id))
         
-        payload = message.get('payload', {})
-        headers = {h['name']: h['value'] for h in payload.get('headers', [])}
-        body_text = self._extract_message_body(payload)
+        if 'raw' in message:
+            parsed = parse_raw_message(message['raw'])
+            headers = parsed['headers']
+            body_text, body_lines = self._assemble_body(parsed['plain'], parsed['html'])
+            attachments = []
+            attachment_data = {}
+            for index, part in enumerate(parsed['attachments']):
+                attachments.append({
+                    "filename": part['filename'],
+                    "attachment_id": "",
+                    "size": part['size'],
+                    "mime_type": part['mime_type'],
+                    "is_pdf": part['mime_type'] == 'application/pdf'
+                })
+                attachment_data[index] = part['data']
+        else:
+            payload = message.get('payload', {})
+            headers = {h['name']: h['value'] for h in payload.get('headers', [])}
+            texts = payload_text_parts(payload)
+            body_text, body_lines = self._assemble_body(texts['plain'], texts['html'])
+            attachments = self._extract_attachments(payload)
+            attachment_data = self._inline_attachment_data(payload)
         
-        return {
+        email_info = {
             "message_id": message_id,
             "thread_id": message.get('threadId'),
             "subject": headers.get('Subject', ''),
@@ -35,37 +82,32 @@ class ExtractionService:
             "body": body_text,
             "body_preview": truncate_text(body_text, 200),
             "snippet": message.get('snippet', ''),
-            "attachments": self._extract_attachments(payload)
+            "attachments": attachments
         }
+        return email_info, attachment_data, body_lines
     
-    def _extract_message_body(self, payload: Dict) -> str:
-        import base64
-        body_text = ""
-        html_content = ""
-        
-        parts = payload.get('parts', [payload]) if 'parts' in payload else [payload]
-        for part in parts:
-            mime = part.get('mimeType', '')
-            data = part.get('body', {}).get('data', '')
-            if not data:
-                continue
-            
-            try:
-                decoded = base64.urlsafe_b64decode(data).decode('utf-8', errors='ignore')
-            except:
-                continue
-            
-            if mime == 'text/plain':
-                body_text += decoded + "\n"
-            elif mime == 'text/html':
-                html_content += decoded
+    def extract_email_info(self, message_id: str, message: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        return self._load_email(message_id, message)[0]
+    
+    def _assemble_body(self, plain_parts: List[str], html_parts: List[str]) -> Tuple[str, str]:
+        body_lines = "".join(text + "\n" for text in plain_parts)
+        html_content = "".join(html_parts)
         
         if html_content:
-            body_text = html_to_text(html_content)
-        elif body_text:
-            body_text = clean_text(body_text)
+            body_lines = html_to_text(html_content, keep_lines=True, max_chars=self.settings.HTML_TEXT_MAX_CHARS)
         
-        return body_text
+        return clean_text(body_lines), body_lines
+    
+    def _extract_message_body(self, payload: Dict) -> str:
+        texts = payload_text_parts(payload)
+        return self._assemble_body(texts['plain'], texts['html'])[0]
+    
+    def _attachment_parts(self, payload: Dict) -> List[Dict[str, Any]]:
+        return [
+            part for part in walk_payload(payload)
+            if is_attachment_part(part.get('filename', ''), part.get('mimeType', ''))
+            and (part.get('filename') or part.get('body', {}).get('attachmentId'))
+        ]
     
     def _extract_attachments(self, payload: Dict) -> List[Dict[str, Any]]:
         return [
@@ -76,37 +118,66 @@ class ExtractionService:
                 "mime_type": part.get('mimeType', ''),
                 "is_pdf": part.get('mimeType', '') == 'application/pdf'
             }
-            for part in payload.get('parts', []) if part.get('filename')
+            for part in self._attachment_parts(payload)
         ]
     
+    def _inline_attachment_data(self, payload: Dict) -> Dict[int, bytes]:
+        return {
+            index: b64url_decode(part['body']['data'])
+            for index, part in enumerate(self._attachment_parts(payload))
+            if part.get('body', {}).get('data') and not part['body'].get('attachmentId')
+        }
+    
     def download_attachment(self, message_id: str, attachment_id: str) -> bytes:
-        import base64
-        if not self.gmail_service.service:
-            self.gmail_service.build_service()
+        return self.gmail_service.get_attachment(message_id, attachment_id)
+    
+    def _attachment_bytes(self, message_id: str, index: int, att: Dict[str, Any],
+                          attachment_data: Dict[int, bytes]) -> bytes:
+        if index in attachment_data:
+            return attachment_data[index]
+        return self.download_attachment(message_id, att['attachment_id'])
+    
+    def _process_pdf_attachments(self, message_id: str, attachments: List[Dict[str, Any]],
+                                 attachment_data: Dict[int, bytes],
+                                 **process_options) -> List[Tuple[Dict[str, Any], Optional[Dict[str, Any]], Optional[Exception]]]:
+        pdfs = [(index, att) for index, att in enumerate(attachments) if att.get('is_pdf')]
+        
+        def load(index: int, att: Dict[str, Any]) -> Dict[str, Any]:
+            pdf_data = self._attachment_bytes(message_id, index, att, attachment_data)
+            return self.pdf_service.process_pdf(pdf_data, **process_options)
         
-        attachment = self.gmail_service.service.users().messages().attachments().get(
-            userId='me', messageId=message_id, id=attachment_id
-        ).execute()
-        return base64.urlsafe_b64decode(attachment['data'])
+        if len(pdfs) > 1 and self.settings.ATTACHMENT_CONCURRENCY > 1:
+            futures = [
+                self.attachment_executor.submit(contextvars.copy_context().run, load, index, att)
+                for index, att in pdfs
+            ]
+        else:
+            futures = None
+        
+        outcomes = []
+        for position, (index, att) in enumerate(pdfs):
+            try:
+                pdf_info = futures[position].result() if futures else load(index, att)
+                outcomes.append((att, pdf_info, None))
+            except Exception as e:
+                outcomes.append((att, None, e))
+        return outcomes
     
-    def analyze_email_with_pdfs(self, message_id: str) -> Dict[str, Any]:
-        email_info = self.extract_email_info(message_id)
+    def analyze_email_with_pdfs(self, message_id: str, message: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        email_info, attachment_data, _ = self._load_email(message_id, message)
         pdf_results = []
         
-        for att in email_info.get('attachments', []):
-            if att.get('is_pdf'):
-                try:
-                    pdf_data = self.download_attachment(message_id, att['attachment_id'])
-                    pdf_info = self.pdf_service.process_pdf(pdf_data)
-                    pdf_results.append({
-                        "filename": att['filename'],
-                        "text": pdf_info['text'],
-                        "metadata": pdf_info['metadata'],
-                        "text_length": pdf_info['text_length'],
-                        "has_text": pdf_info['has_text']
-                    })
-                except Exception as e:
-                    pdf_results.append({"filename": att['filename'], "error": str(e)})
+        for att, pdf_info, error in self._process_pdf_attachments(message_id, email_info.get('attachments', []), attachment_data):
+            if error is not None:
+                pdf_results.append({"filename": att['filename'], "error": str(error)})
+                continue
+            pdf_results.append({
+                "filename": att['filename'],
+                "text": pdf_info['text'],
+                "metadata": pdf_info['metadata'],
+                "text_length": pdf_info['text_length'],
+                "has_text": pdf_info['has_text']
+            })
         
         return {
             "email": email_info,
@@ -115,36 +186,48 @@ class ExtractionService:
             "total_pdfs_with_text": len([p for p in pdf_results if p.get('has_text', False)])
         }
     
-    def extract_structured_data(self, message_id: str, debug: bool = False) -> Dict[str, Any]:
-        email_info = self.extract_email_info(message_id)
+    def _rules_version(self) -> int:
+        return self.classification_service.rule_engine.get_rules().version
+    
+    def is_stored(self, message_id: str) -> bool:
+        return self.document_store.contains(message_id, self._rules_version())
+    
+    def extract_structured_data(self, message_id: str, debug: bool = False,
+                                message: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        rules_version = self._rules_version()
+        if not debug:
+            stored = self.document_store.get(message_id, rules_version)
+            if stored is not None:
+                return stored
+        
+        email_info, attachment_data, body_lines = self._load_email(message_id, message)
         subject, body = email_info.get('subject', ''), email_info.get('body', '')
         
-        all_pdf_texts = []
-        for att in email_info.get('attachments', []):
-            if att.get('is_pdf'):
-                try:
-                    pdf_data = self.download_attachment(message_id, att['attachment_id'])
-                    all_pdf_texts.append(self.pdf_service.process_pdf(pdf_data).get('text', ''))
-                except:
-                    continue
+        all_pdf_texts = [
+            pdf_info.get('text', '')
+            for _, pdf_info, error in self._process_pdf_attachments(
+                message_id, email_info.get('attachments', []), attachment_data,
+                include_metadata=False
+            )
+            if error is None
+        ]
         
-        pdf_combined = ' '.join(all_pdf_texts)
-        combined_text = f"{subject} {body} {pdf_combined}"
+        features = DocumentFeatures(subject, body, all_pdf_texts, body_lines)
         
-        tipo_documento = self.classification_service.classify_document(subject, body, pdf_combined)
+        tipo_documento = self.classification_service.classify_features(features)
         productos = []
         
-        for pdf_text in all_pdf_texts:
-            productos.extend(self.classification_service.extract_products_from_text(pdf_text))
+        for pdf_features in features.pdf_features:
+            productos.extend(self.classification_service.extract_products_from_features(pdf_features))
         
         if not productos:
-            productos = self.classification_service.extract_products_from_text(body)
+            productos = self.classification_service.extract_products_from_features(features.body_line_features)
         else:
-            body_products = self.classification_service.extract_products_from_text(body)
+            body_products = self.classification_service.extract_products_from_features(features.body_line_features)
             if body_products:
                 productos.extend(body_products)
         
-        totals_data = self.classification_service.extract_totals_from_text(combined_text)
+        totals_data = self.classification_service.extract_totals_from_features(features)
         if totals_data["total"] == 0.0 and productos:
             totals_data["total"] = sum(p.get("total", 0) for p in productos)
         
@@ -162,12 +245,49 @@ class ExtractionService:
         if debug:
             result['debug'] = {
                 "subject": subject, "body_preview": body[:500], "body_length": len(body),
-                "pdf_count": len(all_pdf_texts), "pdf_text_preview": pdf_combined[:500],
-                "pdf_text_length": len(pdf_combined)
+                "pdf_count": len(all_pdf_texts), "pdf_text_preview": features.pdf_text[:500],
+                "pdf_text_length": len(features.pdf_text)
             }
+        else:
+            self.document_store.save(message_id, result, rules_version)
         
         return result
     
+    def classify_message(self, message_id: str, message: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        email_info, attachment_data, _ = self._load_email(message_id, message)
+        subject, body = email_info.get('subject', ''), email_info.get('body', '')
+        
+        tipo_documento, decided = self.classification_service.classify_progress(subject, body)
+        pdf_text = ""
+        pages_read = 0
+        
+        for index, att in enumerate(email_info.get('attachments', [])):
+            if decided:
+                break
+            if not att.get('is_pdf'):
+                continue
+            try:
+                pdf_data = self._attachment_bytes(message_id, index, att, attachment_data)
+                for page_text in self.pdf_service.iter_pages(pdf_data, self.settings.PDF_MAX_PAGES):
+                    pdf_text += page_text + '\f'
+                    pages_read += 1
+                    tipo_documento, decided = self.classification_service.classify_progress(subject, body, pdf_text)
+                    if decided:
+                        break
+                pdf_text += ' '
+            except Exception:
+                continue
+        
+        return {
+            "message_id": message_id,
+            "tipo_documento": tipo_documento,
+            "decidido": decided,
+            "paginas_leidas": pages_read
+        }
+    
+    def shutdown(self):
+        self.attachment_executor.shutdown(wait=False, cancel_futures=True)
+    
     def _parse_date_to_iso(self, date_str: str) -> str:
         try:
             return parsedate_to_datetime(date_str).isoformat() if date_str else datetime.now().isoformat()
@@ -182,14 +302,20 @@ class ExtractionService:
         if not self.gmail_service.service:
             self.gmail_service.build_service()
         
-        messages = self.gmail_service.service.users().messages().list(
+        messages = self.gmail_service.execute(self.gmail_service.service.users().messages().list(
             userId='me', q=query, maxResults=max_results
-        ).execute().get('messages', [])
+        )).get('messages', [])
+        
+        fetched = self.gmail_service.batch_get_messages([msg['id'] for msg in messages], format='full')
         
         analyzed_emails = []
         for msg in messages:
+            detail = fetched.get(msg['id'], {"error": "Mensaje no incluido en la respuesta del lote"})
+            if 'error' in detail:
+                analyzed_emails.append({"message_id": msg['id'], "error": detail['error']})
+                continue
             try:
-                analyzed_emails.append(self.analyze_email_with_pdfs(msg['id']))
+                analyzed_emails.append(self.analyze_email_with_pdfs(msg['id'], detail['response']))
             except Exception as e:
                 analyzed_emails.append({"message_id": msg['id'], "error": str(e)})
         
@@ -1,22 +1,41 @@
 import os
+import base64
 import json
 import shutil
-from typing import Optional
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Dict, List, Any, Iterable, Iterator, Tuple
 from google.auth.transport.requests import Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import Flow
-from googleapiclient.discovery import build
+from googleapiclient import discovery_cache
+from googleapiclient.discovery import build_from_document
+from googleapiclient.http import build_http
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.errors import HttpError
 
 from app.core.config import get_settings
+from app.services.message_cache import MessageCache, cache_format
+from app.services.quota_scheduler import get_quota_scheduler, quota_cost, is_rate_limited
+
+HISTORY_CHANGE_TYPES = ('messagesAdded', 'messagesDeleted', 'labelsAdded', 'labelsRemoved')
 
 class GmailService:
     def __init__(self):
         self.settings = get_settings()
         self.creds: Optional[Credentials] = None
-        self.service = None
+        self._discovery_document: Optional[str] = None
+        self.clients_built = 0
+        self.sync_lock = threading.Lock()
+        self._creds_lock = threading.Lock()
+        self._timer_lock = threading.Lock()
+        self._token_mtime: Optional[int] = None
+        self._refresh_timer: Optional[threading.Timer] = None
+        self._local = threading.local()
+        self.message_cache = MessageCache(self.settings.GMAIL_MESSAGE_CACHE_MAX_BYTES)
+        self.quota = get_quota_scheduler()
     
-    def load_credentials(self) -> bool:
+    def load_credentials(self, force: bool = False) -> bool:
         token_path = self.settings.GMAIL_TOKEN_FILE
         
         if not os.path.exists(token_path) or not os.path.isfile(token_path):
@@ -28,13 +47,21 @@ class GmailService:
             return False
         
         try:
-            self.creds = Credentials.from_authorized_user_file(
-                token_path,
-                self.settings.GMAIL_SCOPES_LIST
-            )
-            return True
+            mtime = os.stat(token_path).st_mtime_ns
+            if not force and self.creds is not None and mtime == self._token_mtime:
+                return True
+            
+            with self._creds_lock:
+                self.creds = Credentials.from_authorized_user_file(
+                    token_path,
+                    self.settings.GMAIL_SCOPES_LIST
+                )
+                self._token_mtime = mtime
         except Exception:
             return False
+        
+        self._schedule_refresh()
+        return True
     
     def save_credentials(self):
         if not self.creds:
@@ -42,41 +69,84 @@ class GmailService:
         
         token_path = self.settings.GMAIL_TOKEN_FILE
         
-        try:
-            if os.path.exists(token_path):
-                if os.path.isdir(token_path):
-                    shutil.rmtree(token_path)
-                else:
-                    os.remove(token_path)
-        except Exception:
-            pass
+        if os.path.isdir(token_path):
+            try:
+                shutil.rmtree(token_path)
+            except Exception:
+                pass
         
         token_dir = os.path.dirname(token_path)
         if token_dir:
             os.makedirs(token_dir, exist_ok=True)
         
-        with open(token_path, 'w') as token:
+        tmp_path = f"{token_path}.tmp"
+        with open(tmp_path, 'w') as token:
             token.write(self.creds.to_json())
+            token.flush()
+            os.fsync(token.fileno())
+        os.replace(tmp_path, token_path)
+        self._token_mtime = os.stat(token_path).st_mtime_ns
     
-    def refresh_credentials(self) -> bool:
-        if self.creds and self.creds.expired and self.creds.refresh_token:
+    def _expiring(self, creds: Credentials) -> bool:
+        if creds.expiry is None:
+            return False
+        now = datetime.now(timezone.utc).replace(tzinfo=None)
+        return creds.expiry - now <= timedelta(seconds=self.settings.GMAIL_TOKEN_REFRESH_MARGIN_SECONDS)
+    
+    def refresh_credentials(self, stale_token: Optional[str] = None) -> bool:
+        with self._creds_lock:
+            creds = self.creds
+            if not creds or not creds.refresh_token:
+                return False
+            if creds.valid and not self._expiring(creds) and creds.token != stale_token:
+                return True
             try:
-                self.creds.refresh(Request())
+                creds.refresh(Request())
                 self.save_credentials()
-                return True
-            except Exception:
+            except Exception as e:
+                print(f"Error al renovar las credenciales de Gmail: {e}")
                 return False
-        return False
+        
+        self._schedule_refresh()
+        return True
+    
+    def _schedule_refresh(self, delay: Optional[float] = None):
+        creds = self.creds
+        if delay is None:
+            if not creds or not creds.refresh_token or creds.expiry is None:
+                return
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            expires_in = (creds.expiry - now).total_seconds()
+            delay = max(0.0, expires_in - self.settings.GMAIL_TOKEN_REFRESH_MARGIN_SECONDS)
+        
+        with self._timer_lock:
+            if self._refresh_timer:
+                self._refresh_timer.cancel()
+            self._refresh_timer = threading.Timer(delay, self._background_refresh)
+            self._refresh_timer.daemon = True
+            self._refresh_timer.start()
+    
+    def _background_refresh(self):
+        if not self.refresh_credentials():
+            print("No se pudieron renovar las credenciales de Gmail en segundo plano, se reintentará")
+            self._schedule_refresh(60.0)
+    
+    def stop_refresh(self):
+        with self._timer_lock:
+            if self._refresh_timer:
+                self._refresh_timer.cancel()
+                self._refresh_timer = None
     
     def is_authenticated(self) -> bool:
         if not self.load_credentials():
             return False
         
-        if not self.creds or not self.creds.valid:
-            if self.creds and self.creds.expired and self.creds.refresh_token:
-                return self.refresh_credentials()
-            return False
-        return True
+        creds = self.creds
+        if creds.valid:
+            return True
+        if creds.expired and creds.refresh_token:
+            return self.refresh_credentials()
+        return False
     
     def get_authorization_url(self) -> tuple[str, Flow]:
         if not os.path.exists(self.settings.GMAIL_CREDENTIALS_FILE):
@@ -101,8 +171,10 @@ class GmailService:
     def authenticate_with_code(self, code: str, flow: Flow) -> bool:
         try:
             flow.fetch_token(code=code)
-            self.creds = flow.credentials
-            self.save_credentials()
+            with self._creds_lock:
+                self.creds = flow.credentials
+                self.save_credentials()
+            self._schedule_refresh()
             return True
         except Exception:
             return False
@@ -123,15 +195,56 @@ class GmailService:
             self.settings.GMAIL_CREDENTIALS_FILE,
             self.settings.GMAIL_SCOPES_LIST
         )
-        self.creds = flow.run_local_server(port=0)
-        self.save_credentials()
+        creds = flow.run_local_server(port=0)
+        with self._creds_lock:
+            self.creds = creds
+            self.save_credentials()
         return True
     
     def _ensure_service(self):
-        if not self.service:
+        if self._discovery_document is None:
             if not self.is_authenticated():
                 raise ValueError("No autenticado. Por favor autentícate primero.")
-            self.service = build('gmail', 'v1', credentials=self.creds)
+            document = discovery_cache.get_static_doc('gmail', 'v1')
+            if document is None:
+                raise ValueError("No se encontró el documento de discovery de Gmail incluido en google-api-python-client")
+            self._discovery_document = document
+    
+    @property
+    def service(self):
+        if self._discovery_document is None:
+            return None
+        http = self._thread_http()
+        client, client_http = getattr(self._local, 'service', (None, None))
+        if client is None or client_http is not http:
+            client = build_from_document(self._discovery_document, http=http)
+            self._local.service = (client, http)
+            self.clients_built += 1
+        return client
+    
+    def _thread_http(self) -> AuthorizedHttp:
+        http = getattr(self._local, 'http', None)
+        if http is None or http.credentials is not self.creds:
+            http = AuthorizedHttp(self.creds, http=build_http())
+            self._local.http = http
+        return http
+    
+    def execute(self, request) -> Any:
+        cost = quota_cost(getattr(request, 'methodId', None))
+        attempt = 0
+        while True:
+            self.quota.acquire(cost)
+            try:
+                response = request.execute(http=self._thread_http())
+            except HttpError as error:
+                if not is_rate_limited(error.resp.status, error.content) or attempt >= self.quota.max_retries:
+                    raise
+                attempt += 1
+                delay = self.quota.backoff()
+                print(f"Límite de cuota de Gmail alcanzado en {request.methodId}, reintento {attempt} en {delay:.1f}s")
+                continue
+            self.quota.succeeded()
+            return response
     
     def build_service(self):
         self._ensure_service()
@@ -140,7 +253,7 @@ class GmailService:
     def test_connection(self) -> dict:
         try:
             self._ensure_service()
-            profile = self.service.users().getProfile(userId='me').execute()
+            profile = self.execute(self.service.users().getProfile(userId='me'))
             return {
                 "status": "success",
                 "email": profile.get('emailAddress'),
@@ -153,22 +266,234 @@ class GmailService:
     def get_messages(self, max_results: int = 10, query: str = "") -> list:
         try:
             self._ensure_service()
-            results = self.service.users().messages().list(
+            results = self.execute(self.service.users().messages().list(
                 userId='me',
                 maxResults=max_results,
                 q=query
-            ).execute()
+            ))
             return results.get('messages', [])
         except Exception:
             return []
     
-    def get_message_json(self, message_id: str) -> dict:
+    def list_message_page(self, query: str = "", page_token: Optional[str] = None,
+                          page_size: int = 100) -> Dict[str, Any]:
         self._ensure_service()
-        return self.service.users().messages().get(
+        params = {"userId": 'me', "q": query, "maxResults": page_size}
+        if page_token:
+            params["pageToken"] = page_token
+        response = self.execute(self.service.users().messages().list(**params))
+        return {
+            "message_ids": [message['id'] for message in response.get('messages', [])],
+            "next_page_token": response.get('nextPageToken'),
+            "result_size_estimate": response.get('resultSizeEstimate', 0)
+        }
+    
+    def iter_message_ids(self, query: str = "", page_size: int = 100, max_results: int = 0) -> Iterator[str]:
+        page_token = None
+        count = 0
+        while True:
+            page = self.list_message_page(query, page_token, page_size)
+            for message_id in page['message_ids']:
+                yield message_id
+                count += 1
+                if max_results and count >= max_results:
+                    return
+            page_token = page['next_page_token']
+            if not page_token:
+                return
+    
+    def get_message_json(self, message_id: str, format: str = 'full',
+                         metadata_headers: Optional[List[str]] = None) -> dict:
+        key_format = cache_format(format, metadata_headers)
+        cached = self.message_cache.get(message_id, key_format)
+        if cached is not None:
+            return cached
+        
+        self._ensure_service()
+        params = {"userId": 'me', "id": message_id, "format": format}
+        if metadata_headers:
+            params["metadataHeaders"] = metadata_headers
+        message = self.execute(self.service.users().messages().get(**params))
+        self.message_cache.put(message_id, key_format, message)
+        return message
+    
+    def get_attachment(self, message_id: str, attachment_id: str) -> bytes:
+        self._ensure_service()
+        attachment = self.execute(self.service.users().messages().attachments().get(
+            userId='me', messageId=message_id, id=attachment_id
+        ))
+        return base64.urlsafe_b64decode(attachment['data'])
+    
+    def load_history_checkpoint(self) -> Optional[str]:
+        history_path = self.settings.GMAIL_HISTORY_FILE
+        if not os.path.isfile(history_path):
+            return None
+        
+        try:
+            with open(history_path) as history_file:
+                return str(json.load(history_file).get('historyId') or '') or None
+        except Exception:
+            return None
+    
+    def save_history_checkpoint(self, history_id: str):
+        if not history_id:
+            return
+        
+        history_path = self.settings.GMAIL_HISTORY_FILE
+        history_dir = os.path.dirname(history_path)
+        if history_dir:
+            os.makedirs(history_dir, exist_ok=True)
+        
+        tmp_path = f"{history_path}.tmp"
+        with open(tmp_path, 'w') as history_file:
+            json.dump({'historyId': str(history_id)}, history_file)
+            history_file.flush()
+            os.fsync(history_file.fileno())
+        os.replace(tmp_path, history_path)
+    
+    def sync_new_messages(self, label_id: Optional[str] = None) -> Dict[str, Any]:
+        self._ensure_service()
+        label_id = label_id or next(iter(self.settings.GMAIL_WATCH_LABEL_IDS_LIST), 'INBOX')
+        start_history_id = self.load_history_checkpoint()
+        
+        if start_history_id:
+            try:
+                return self._fetch_history(start_history_id, label_id)
+            except HttpError as error:
+                if error.resp.status != 404:
+                    raise
+        
+        return self._full_resync(label_id)
+    
+    def _fetch_history(self, start_history_id: str, label_id: str) -> Dict[str, Any]:
+        message_ids: List[str] = []
+        changes: Dict[str, int] = {}
+        latest_history_id = start_history_id
+        page_token = None
+        
+        while True:
+            params = {
+                'userId': 'me',
+                'startHistoryId': start_history_id,
+                'historyTypes': ['messageAdded', 'messageDeleted', 'labelAdded', 'labelRemoved'],
+                'labelId': label_id,
+                'maxResults': 500
+            }
+            if page_token:
+                params['pageToken'] = page_token
+            
+            response = self.execute(self.service.users().history().list(**params))
+            for record in response.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message = added.get('message', {})
+                    if label_id in message.get('labelIds', [label_id]):
+                        message_ids.append(message['id'])
+                record_id = int(record.get('id', 0))
+                for change in HISTORY_CHANGE_TYPES:
+                    for item in record.get(change, []):
+                        message_id = item.get('message', {}).get('id')
+                        if message_id:
+                            changes[message_id] = max(changes.get(message_id, 0), record_id)
+            
+            latest_history_id = response.get('historyId', latest_history_id)
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                break
+        
+        self.message_cache.invalidate_changes(changes)
+        return {
+            "message_ids": list(dict.fromkeys(message_ids)),
+            "history_id": latest_history_id,
+            "full_resync": False
+        }
+    
+    def _full_resync(self, label_id: str) -> Dict[str, Any]:
+        history_id = self.execute(self.service.users().getProfile(userId='me')).get('historyId')
+        messages = self.execute(self.service.users().messages().list(
             userId='me',
-            id=message_id,
-            format='full'
-        ).execute()
+            labelIds=[label_id],
+            maxResults=self.settings.GMAIL_SYNC_FULL_RESYNC_MAX
+        )).get('messages', [])
+        message_ids = [msg['id'] for msg in messages]
+        self.message_cache.invalidate(message_ids)
+        
+        return {
+            "message_ids": message_ids,
+            "history_id": history_id,
+            "full_resync": True
+        }
+    
+    def execute_batch(self, requests: Iterable[Tuple[str, Any]], batch_size: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        self._ensure_service()
+        batch_size = max(1, min(batch_size or self.settings.GMAIL_BATCH_SIZE, 100))
+        pending = list(requests)
+        results: Dict[str, Dict[str, Any]] = {}
+        throttled: List[Tuple[str, Any]] = []
+        by_key = dict(pending)
+        
+        def callback(request_id, response, exception):
+            if exception is not None:
+                if isinstance(exception, HttpError) and is_rate_limited(exception.resp.status, exception.content):
+                    throttled.append((request_id, by_key[request_id]))
+                results[request_id] = {"error": str(exception)}
+            else:
+                results[request_id] = {"response": response}
+        
+        for attempt in range(self.quota.max_retries + 1):
+            for start in range(0, len(pending), batch_size):
+                chunk = pending[start:start + batch_size]
+                self.quota.acquire(sum(quota_cost(getattr(request, 'methodId', None)) for _, request in chunk))
+                batch = self.service.new_batch_http_request(callback=callback)
+                for key, request in chunk:
+                    batch.add(request, request_id=key)
+                try:
+                    batch.execute()
+                except Exception as e:
+                    for key, _ in chunk:
+                        results.setdefault(key, {"error": str(e)})
+            
+            if not throttled or attempt == self.quota.max_retries:
+                break
+            pending, throttled = throttled, []
+            delay = self.quota.backoff()
+            print(f"Límite de cuota de Gmail alcanzado en {len(pending)} solicitudes del lote, reintento en {delay:.1f}s")
+        
+        if not throttled:
+            self.quota.succeeded()
+        return results
+    
+    def batch_get_messages(self, message_ids: List[str], format: str = 'full',
+                           metadata_headers: Optional[List[str]] = None,
+                           batch_size: Optional[int] = None) -> Dict[str, Dict[str, Any]]:
+        key_format = cache_format(format, metadata_headers)
+        results: Dict[str, Dict[str, Any]] = {}
+        missing = []
+        for message_id in dict.fromkeys(message_ids):
+            cached = self.message_cache.get(message_id, key_format)
+            if cached is not None:
+                results[message_id] = {"response": cached}
+            else:
+                missing.append(message_id)
+        
+        if not missing:
+            return results
+        
+        self._ensure_service()
+        messages = self.service.users().messages()
+        requests = []
+        for message_id in missing:
+            params = {"userId": 'me', "id": message_id, "format": format}
+            if metadata_headers:
+                params["metadataHeaders"] = metadata_headers
+            requests.append((message_id, messages.get(**params)))
+        
+        fetched = self.execute_batch(requests, batch_size)
+        for message_id in missing:
+            result = fetched.get(message_id, {"error": "Mensaje no incluido en la respuesta del lote"})
+            if 'response' in result:
+                self.message_cache.put(message_id, key_format, result['response'])
+            results[message_id] = result
+        return results
     
 _gmail_service_instance: Optional[GmailService] = None
 
@@ -0,0 +1,122 @@
+import queue
+import threading
+from typing import Dict, Any, List, Optional, Set
+from app.core.config import get_settings
+from app.services.gmail_service import get_gmail_service
+from app.services.processing_service import ProcessingService, get_processing_service
+from app.services.job_store import get_job_store
+from app.services.quota_scheduler import quota_priority, PRIORITY_BACKGROUND
+
+
+class JobService:
+    def __init__(self):
+        self.settings = get_settings()
+        self.store = get_job_store()
+        self.gmail_service = get_gmail_service()
+        self.processing_service = get_processing_service()
+        self._queue: "queue.Queue[Optional[str]]" = queue.Queue()
+        self._threads: List[threading.Thread] = []
+        self._cancelled: Set[str] = set()
+        self._lock = threading.Lock()
+        self._stopping = False
+
+    def start(self):
+        with self._lock:
+            if self._threads:
+                return
+            self._stopping = False
+            for job_id in self.store.unfinished():
+                self._queue.put(job_id)
+            for index in range(max(1, self.settings.JOB_WORKERS)):
+                thread = threading.Thread(target=self._run, name=f"job-worker-{index}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def stop(self, timeout: float = 30.0):
+        with self._lock:
+            self._stopping = True
+            threads, self._threads = self._threads, []
+        for _ in threads:
+            self._queue.put(None)
+        for thread in threads:
+            thread.join(timeout)
+        self._queue = queue.Queue()
+
+    def submit(self, query: Optional[str] = None, max_results: int = 0, debug: bool = False) -> Dict[str, Any]:
+        self.start()
+        job_id = self.store.create(query, max_results=max_results, debug=debug)
+        self._queue.put(job_id)
+        return self.store.get(job_id, include_results=False)
+
+    def cancel(self, job_id: str) -> bool:
+        if not self.store.cancel(job_id):
+            return False
+        with self._lock:
+            self._cancelled.add(job_id)
+        return True
+
+    def _should_stop(self, job_id: str) -> bool:
+        with self._lock:
+            return self._stopping or job_id in self._cancelled
+
+    def _run(self):
+        while True:
+            job_id = self._queue.get()
+            if job_id is None:
+                return
+            try:
+                with quota_priority(PRIORITY_BACKGROUND):
+                    self._run_job(job_id)
+            except Exception as e:
+                print(f"Error en el trabajo {job_id}: {e}")
+                self.store.set_status(job_id, 'failed', str(e))
+            finally:
+                with self._lock:
+                    self._cancelled.discard(job_id)
+
+    def _list_messages(self, job: Dict[str, Any]):
+        if job['query'] is not None:
+            message_ids = list(self.gmail_service.iter_message_ids(
+                job['query'], page_size=self.settings.EXPORT_PAGE_SIZE, max_results=job['max_results']
+            ))
+            self.store.add_messages(job['job_id'], message_ids)
+            return
+
+        with self.gmail_service.sync_lock:
+            sync = self.gmail_service.sync_new_messages()
+            details = self.gmail_service.batch_get_messages(
+                sync['message_ids'],
+                format='metadata',
+                metadata_headers=['Date']
+            ) if sync['message_ids'] else {}
+            ordered = ProcessingService._order_by_date(details)
+            self.store.add_messages(job['job_id'], [message_id for _, message_id in ordered])
+
+    def _run_job(self, job_id: str):
+        job = self.store.get(job_id, include_results=False)
+        if job is None or not self.store.set_status(job_id, 'running'):
+            return
+
+        if job['total'] is None:
+            self._list_messages(job)
+
+        for message_id in self.store.pending_messages(job_id):
+            if self._should_stop(job_id):
+                return
+            try:
+                result = self.processing_service.process_message(message_id, debug=job['debug'])
+                self.store.finish_message(job_id, message_id, result=result)
+            except Exception as e:
+                print(f"Error al procesar el mensaje {message_id} del trabajo {job_id}: {e}")
+                self.store.finish_message(job_id, message_id, error=str(e))
+
+        self.store.set_status(job_id, 'completed')
+
+
+_job_service_instance: Optional[JobService] = None
+
+def get_job_service() -> JobService:
+    global _job_service_instance
+    if _job_service_instance is None:
+        _job_service_instance = JobService()
+    return _job_service_instance
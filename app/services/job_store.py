@@ -0,0 +1,170 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional
+from app.core.config import get_settings
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    job_id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    query TEXT,
+    max_results INTEGER NOT NULL DEFAULT 0,
+    debug INTEGER NOT NULL DEFAULT 0,
+    listed INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    created_at TEXT NOT NULL,
+    started_at TEXT,
+    finished_at TEXT
+);
+CREATE TABLE IF NOT EXISTS job_messages (
+    job_id TEXT NOT NULL REFERENCES jobs(job_id) ON DELETE CASCADE,
+    posicion INTEGER NOT NULL,
+    message_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    result TEXT,
+    error TEXT,
+    PRIMARY KEY (job_id, posicion)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status_created ON jobs (status, created_at);
+"""
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class JobStore:
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._local = threading.local()
+        db_dir = os.path.dirname(db_path)
+        if db_dir:
+            os.makedirs(db_dir, exist_ok=True)
+        self._connection().executescript(SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30)
+            connection.row_factory = sqlite3.Row
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.execute("PRAGMA foreign_keys=ON")
+            self._local.connection = connection
+        return connection
+
+    def create(self, query: Optional[str], max_results: int = 0, debug: bool = False) -> str:
+        job_id = uuid.uuid4().hex
+        with self._connection() as connection:
+            connection.execute(
+                "INSERT INTO jobs (job_id, status, query, max_results, debug, created_at) VALUES (?, 'queued', ?, ?, ?, ?)",
+                (job_id, query, max_results, int(debug), _now())
+            )
+        return job_id
+
+    def set_status(self, job_id: str, status: str, error: Optional[str] = None) -> bool:
+        column = 'started_at' if status == 'running' else 'finished_at' if status in FINISHED_STATUSES else None
+        assignments = "status = ?, error = ?" + (f", {column} = ?" if column else "")
+        params = [status, error] + ([_now()] if column else []) + [job_id]
+        with self._connection() as connection:
+            cursor = connection.execute(
+                f"UPDATE jobs SET {assignments} WHERE job_id = ? AND status IN ('queued', 'running')", params
+            )
+        return cursor.rowcount > 0
+
+    def cancel(self, job_id: str) -> bool:
+        return self.set_status(job_id, 'cancelled')
+
+    def add_messages(self, job_id: str, message_ids: List[str]):
+        with self._connection() as connection:
+            connection.execute("DELETE FROM job_messages WHERE job_id = ?", (job_id,))
+            connection.executemany(
+                "INSERT INTO job_messages (job_id, posicion, message_id, status) VALUES (?, ?, ?, 'pending')",
+                [(job_id, posicion, message_id) for posicion, message_id in enumerate(message_ids)]
+            )
+            connection.execute("UPDATE jobs SET listed = 1 WHERE job_id = ?", (job_id,))
+
+    def pending_messages(self, job_id: str) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT message_id FROM job_messages WHERE job_id = ? AND status = 'pending' ORDER BY posicion",
+            (job_id,)
+        ).fetchall()
+        return [row["message_id"] for row in rows]
+
+    def finish_message(self, job_id: str, message_id: str, result: Optional[Dict[str, Any]] = None,
+                       error: Optional[str] = None):
+        with self._connection() as connection:
+            connection.execute(
+                "UPDATE job_messages SET status = ?, result = ?, error = ? WHERE job_id = ? AND message_id = ?",
+                (
+                    'error' if error is not None else 'done',
+                    json.dumps(result, ensure_ascii=False) if result is not None else None,
+                    error,
+                    job_id,
+                    message_id
+                )
+            )
+
+    def unfinished(self) -> List[str]:
+        rows = self._connection().execute(
+            "SELECT job_id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+        ).fetchall()
+        return [row["job_id"] for row in rows]
+
+    def get(self, job_id: str, include_results: bool = True) -> Optional[Dict[str, Any]]:
+        connection = self._connection()
+        job = connection.execute("SELECT * FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        if job is None:
+            return None
+        columns = "message_id, status, result, error" if include_results else "status"
+        messages = connection.execute(
+            f"SELECT {columns} FROM job_messages WHERE job_id = ? ORDER BY posicion", (job_id,)
+        ).fetchall()
+
+        summary = {
+            "job_id": job["job_id"],
+            "status": job["status"],
+            "query": job["query"],
+            "max_results": job["max_results"],
+            "debug": bool(job["debug"]),
+            "error": job["error"],
+            "created_at": job["created_at"],
+            "started_at": job["started_at"],
+            "finished_at": job["finished_at"],
+            "total": len(messages) if job["listed"] else None,
+            "processed": sum(1 for row in messages if row["status"] != 'pending'),
+            "failed": sum(1 for row in messages if row["status"] == 'error')
+        }
+        if include_results:
+            summary["message_ids"] = [row["message_id"] for row in messages]
+            summary["results"] = {
+                row["message_id"]: json.loads(row["result"]) for row in messages if row["status"] == 'done'
+            }
+            summary["errors"] = {row["message_id"]: row["error"] for row in messages if row["status"] == 'error'}
+        return summary
+
+    def list(self, status: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        if status:
+            rows = self._connection().execute(
+                "SELECT job_id FROM jobs WHERE status = ? ORDER BY created_at DESC LIMIT ?", (status, limit)
+            ).fetchall()
+        else:
+            rows = self._connection().execute(
+                "SELECT job_id FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)
+            ).fetchall()
+        return [self.get(row["job_id"], include_results=False) for row in rows]
+
+
+_job_store_instance: Optional[JobStore] = None
+
+def get_job_store() -> JobStore:
+    global _job_store_instance
+    if _job_store_instance is None:
+        _job_store_instance = JobStore(get_settings().JOB_STORE_PATH)
+    return _job_store_instance
@@ -0,0 +1,197 @@
+import time
+import atexit
+import random
+import threading
+from typing import Dict, List, Tuple, Optional, Any
+import httplib2
+from googleapiclient.errors import HttpError
+from app.core.config import get_settings
+from app.services.label_service import get_label_service, is_missing_label_error
+from app.services.quota_scheduler import quota_priority, PRIORITY_BACKGROUND
+
+MAX_IDS_PER_CALL = 1000
+MAX_STORED_FAILURES = 1000
+
+LabelKey = Tuple[Tuple[str, ...], Tuple[str, ...]]
+
+
+def is_transient_error(error: Exception) -> bool:
+    if isinstance(error, HttpError):
+        return error.resp.status >= 500
+    return isinstance(error, (OSError, httplib2.HttpLib2Error))
+
+
+class LabelQueue:
+    def __init__(self):
+        self.settings = get_settings()
+        self.label_service = get_label_service()
+        self._pending: Dict[LabelKey, Dict[str, None]] = {}
+        self._oldest_pending: Optional[float] = None
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._atexit_registered = False
+        self.flushes = 0
+        self.flushed_messages = 0
+        self.failed_messages = 0
+        self.failed: Dict[str, str] = {}
+        self.label_refreshes = 0
+        self.retries = 0
+        self.splits = 0
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def start(self):
+        with self._condition:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="label-queue", daemon=True)
+            self._thread.start()
+            if not self._atexit_registered:
+                atexit.register(self.stop)
+                self._atexit_registered = True
+
+    def stop(self, timeout: float = 30.0):
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+
+    def enqueue(self, message_id: str, label_name: str):
+        self.enqueue_modify([message_id], [label_name], ['INBOX'])
+
+    def enqueue_modify(self, message_ids: List[str], add_labels: List[str], remove_labels: List[str]):
+        key = (tuple(sorted(add_labels)), tuple(sorted(remove_labels)))
+        with self._condition:
+            self._pending.setdefault(key, {}).update(dict.fromkeys(message_ids))
+            if self._oldest_pending is None:
+                self._oldest_pending = time.monotonic()
+            if self._depth() >= self.settings.LABEL_QUEUE_FLUSH_SIZE:
+                self._condition.notify_all()
+        if not self._thread:
+            self.start()
+
+    def _depth(self) -> int:
+        return sum(len(ids) for ids in self._pending.values())
+
+    @property
+    def depth(self) -> int:
+        with self._condition:
+            return self._depth()
+
+    def _run(self):
+        interval = self.settings.LABEL_QUEUE_FLUSH_INTERVAL
+        while True:
+            with self._condition:
+                while not self._stopping:
+                    if self._pending:
+                        if self._depth() >= self.settings.LABEL_QUEUE_FLUSH_SIZE:
+                            break
+                        waited = time.monotonic() - self._oldest_pending
+                        if waited >= interval:
+                            break
+                        self._condition.wait(interval - waited)
+                    else:
+                        self._condition.wait()
+                if self._stopping:
+                    return
+            with quota_priority(PRIORITY_BACKGROUND):
+                self.flush()
+
+    def flush(self):
+        with self._condition:
+            pending, self._pending = self._pending, {}
+            self._oldest_pending = None
+        if not pending:
+            return
+
+        start = time.monotonic()
+        for (add_labels, remove_labels), ids in pending.items():
+            ids = list(ids)
+            for offset in range(0, len(ids), MAX_IDS_PER_CALL):
+                self._apply(ids[offset:offset + MAX_IDS_PER_CALL], list(add_labels), list(remove_labels))
+
+        self.last_flush_seconds = time.monotonic() - start
+        self.total_flush_seconds += self.last_flush_seconds
+        self.flushes += 1
+
+    def _record_failure(self, message_ids: List[str], add_labels: Tuple[str, ...], error: str):
+        self.failed_messages += len(message_ids)
+        print(f"No se aplicaron las etiquetas {', '.join(add_labels)} a los mensajes {', '.join(message_ids)}: {error}")
+        with self._condition:
+            for message_id in message_ids:
+                if len(self.failed) >= MAX_STORED_FAILURES:
+                    break
+                self.failed[message_id] = f"{', '.join(add_labels)}: {error}"
+
+    def _apply(self, message_ids: List[str], add_labels: List[str], remove_labels: List[str]):
+        error = self._batch_modify_with_retry(message_ids, add_labels, remove_labels)
+        if error is None:
+            self.flushed_messages += len(message_ids)
+            return
+        if (isinstance(error, HttpError) and error.resp.status == 400
+                and not is_missing_label_error(error) and len(message_ids) > 1):
+            self.splits += 1
+            middle = len(message_ids) // 2
+            self._apply(message_ids[:middle], add_labels, remove_labels)
+            self._apply(message_ids[middle:], add_labels, remove_labels)
+            return
+        self._record_failure(message_ids, tuple(add_labels), str(error))
+
+    def _resolve(self, labels: List[str]) -> List[str]:
+        return [self.label_service.get_label_id(label) for label in labels]
+
+    def _batch_modify_with_retry(self, message_ids: List[str], add_labels: List[str], remove_labels: List[str]) -> Optional[Exception]:
+        max_retries = self.settings.LABEL_QUEUE_MAX_RETRIES
+        labels_refreshed = False
+        attempt = 0
+        while True:
+            try:
+                add_label_ids, remove_label_ids = self._resolve(add_labels), self._resolve(remove_labels)
+            except ValueError as e:
+                return e
+            try:
+                self.label_service.batch_modify_messages(message_ids, add_label_ids, remove_label_ids)
+                return None
+            except Exception as e:
+                if is_missing_label_error(e) and not labels_refreshed:
+                    labels_refreshed = True
+                    self.label_refreshes += 1
+                    self.label_service.invalidate_label_cache()
+                    continue
+                if not is_transient_error(e):
+                    return e
+                if attempt == max_retries:
+                    print(f"Error al aplicar etiquetas a {len(message_ids)} mensajes tras {attempt + 1} intentos: {e}")
+                    return e
+                self.retries += 1
+                delay = self.settings.LABEL_QUEUE_RETRY_BASE_DELAY * (2 ** attempt)
+                attempt += 1
+                time.sleep(delay + random.uniform(0, delay))
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "depth": self.depth,
+            "flushes": self.flushes,
+            "flushed_messages": self.flushed_messages,
+            "failed_messages": self.failed_messages,
+            "retries": self.retries,
+            "splits": self.splits,
+            "label_refreshes": self.label_refreshes,
+            "failed_ids": list(self.failed)[:50],
+            "last_flush_seconds": round(self.last_flush_seconds, 4),
+            "avg_flush_seconds": round(self.total_flush_seconds / self.flushes, 4) if self.flushes else 0.0
+        }
+
+
+_label_queue_instance: Optional[LabelQueue] = None
+
+def get_label_queue() -> LabelQueue:
+    global _label_queue_instance
+    if _label_queue_instance is None:
+        _label_queue_instance = LabelQueue()
+    return _label_queue_instance
@@ -1,41 +1,129 @@
-from typing import Optional
+import time
+import threading
+from typing import Optional, Dict, Any, List
 from googleapiclient.errors import HttpError
+from app.core.config import get_settings
 from app.services.gmail_service import get_gmail_service
 
 
+def is_missing_label_error(error: Exception) -> bool:
+    if not isinstance(error, HttpError):
+        return False
+    if error.resp.status == 404:
+        return True
+    content = error.content.decode('utf-8', errors='replace') if isinstance(error.content, bytes) else str(error.content)
+    return error.resp.status == 400 and 'label' in content.lower()
+
+
 class LabelService:
     def __init__(self):
         self.gmail_service = get_gmail_service()
+        self.settings = get_settings()
+        self._label_ids: Dict[str, str] = {}
+        self._loaded_at = 0.0
+        self._lock = threading.Lock()
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.cache_refreshes = 0
+        self.labels_created = 0
     
-    def get_label_id(self, label_name: str) -> str:
+    def _refresh_labels(self):
         if not self.gmail_service.service:
             self.gmail_service.build_service()
         
-        try:
-            labels = self.gmail_service.service.users().labels().list(userId='me').execute()
-            for label in labels.get('labels', []):
-                if label.get('name') == label_name:
-                    return label.get('id')
+        labels = self.gmail_service.execute(self.gmail_service.service.users().labels().list(userId='me'))
+        self._label_ids = {label.get('name'): label.get('id') for label in labels.get('labels', [])}
+        self._loaded_at = time.monotonic()
+        self.cache_refreshes += 1
+    
+    def _create_label(self, label_name: str) -> str:
+        label = self.gmail_service.execute(self.gmail_service.service.users().labels().create(
+            userId='me',
+            body={
+                'name': label_name,
+                'labelListVisibility': 'labelShow',
+                'messageListVisibility': 'show'
+            }
+        ))
+        self._label_ids[label_name] = label.get('id')
+        self.labels_created += 1
+        return label.get('id')
+    
+    def invalidate_label_cache(self):
+        with self._lock:
+            self._label_ids = {}
+            self._loaded_at = 0.0
+    
+    def get_label_id(self, label_name: str) -> str:
+        with self._lock:
+            fresh = time.monotonic() - self._loaded_at < self.settings.GMAIL_LABEL_CACHE_TTL
+            if fresh and label_name in self._label_ids:
+                self.cache_hits += 1
+                return self._label_ids[label_name]
+            
+            self.cache_misses += 1
+            try:
+                self._refresh_labels()
+                if label_name in self._label_ids:
+                    return self._label_ids[label_name]
+                if label_name in self.settings.GMAIL_AUTO_CREATE_LABELS_LIST:
+                    return self._create_label(label_name)
+            except HttpError as error:
+                raise ValueError(f"Error al obtener etiqueta {label_name}: {error}")
             raise ValueError(f"Etiqueta '{label_name}' no encontrada en Gmail")
-        except HttpError as error:
-            raise ValueError(f"Error al obtener etiqueta {label_name}: {error}")
+    
+    def get_cache_stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+            "refreshes": self.cache_refreshes,
+            "labels_created": self.labels_created,
+            "cached_labels": len(self._label_ids),
+            "age_seconds": round(time.monotonic() - self._loaded_at, 1) if self._loaded_at else None
+        }
+    
+    def batch_modify_messages(self, message_ids: List[str], add_label_ids: List[str], remove_label_ids: List[str]):
+        if not self.gmail_service.service:
+            self.gmail_service.build_service()
+        
+        self.gmail_service.execute(self.gmail_service.service.users().messages().batchModify(
+            userId='me',
+            body={
+                'ids': message_ids,
+                'addLabelIds': add_label_ids,
+                'removeLabelIds': remove_label_ids
+            }
+        ))
+        self.gmail_service.message_cache.invalidate(message_ids)
+    
+    def _modify_message(self, message_id: str, label_name: str):
+        label_id = self.get_label_id(label_name)
+        inbox_id = self.get_label_id('INBOX')
+        
+        self.gmail_service.execute(self.gmail_service.service.users().messages().modify(
+            userId='me',
+            id=message_id,
+            body={
+                'addLabelIds': [label_id],
+                'removeLabelIds': [inbox_id]
+            }
+        ))
+        self.gmail_service.message_cache.invalidate([message_id])
     
     def apply_label_to_message(self, message_id: str, label_name: str) -> bool:
         try:
             if not self.gmail_service.service:
                 self.gmail_service.build_service()
             
-            label_id = self.get_label_id(label_name)
-            inbox_id = self.get_label_id('INBOX')
-            
-            self.gmail_service.service.users().messages().modify(
-                userId='me',
-                id=message_id,
-                body={
-                    'addLabelIds': [label_id],
-                    'removeLabelIds': [inbox_id]
-                }
-            ).execute()
+            try:
+                self._modify_message(message_id, label_name)
+            except HttpError as error:
+                if not is_missing_label_error(error):
+                    raise
+                self.invalidate_label_cache()
+                self._modify_message(message_id, label_name)
             return True
         except HttpError as error:
             print(f"Error al aplicar etiqueta {label_name} al mensaje: {error}")
@@ -53,4 +141,3 @@ def get_label_service() -> LabelService:
     if _label_service_instance is None:
         _label_service_instance = LabelService()
     return _label_service_instance
-
@@ -0,0 +1,119 @@
+import json
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple, List
+
+FORMAT_FALLBACKS = {
+    'minimal': ['minimal', 'metadata', 'full'],
+    'metadata': ['metadata', 'full'],
+    'full': ['full'],
+    'raw': ['raw'],
+}
+
+
+def cache_format(format: str, metadata_headers: Optional[List[str]] = None) -> str:
+    if format == 'metadata' and metadata_headers:
+        return f"metadata:{','.join(sorted(metadata_headers))}"
+    return format
+
+
+def _history_id(message: Dict[str, Any]) -> int:
+    try:
+        return int(message.get('historyId', 0))
+    except (TypeError, ValueError):
+        return 0
+
+
+class MessageCache:
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Tuple[str, str], Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._keys_by_message: Dict[str, set] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def _candidate_formats(self, format: str) -> List[str]:
+        base = format.split(':', 1)[0]
+        fallbacks = [fmt for fmt in FORMAT_FALLBACKS.get(base, [base]) if fmt != base]
+        return [format] + fallbacks
+
+    def get(self, message_id: str, format: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            for fmt in self._candidate_formats(format):
+                key = (message_id, fmt)
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+            return None
+
+    def put(self, message_id: str, format: str, message: Dict[str, Any]):
+        if self.max_bytes <= 0:
+            return
+        size = len(json.dumps(message, separators=(',', ':')))
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            key = (message_id, format)
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (message, size)
+            self._keys_by_message.setdefault(message_id, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def size_estimate(self, message_id: str) -> Optional[int]:
+        with self._lock:
+            for key in self._keys_by_message.get(message_id, ()):
+                size = self._entries[key][0].get('sizeEstimate')
+                if size is not None:
+                    return int(size)
+        return None
+
+    def invalidate_changes(self, changes: Dict[str, int]):
+        with self._lock:
+            for message_id, history_id in changes.items():
+                for key in list(self._keys_by_message.get(message_id, ())):
+                    if _history_id(self._entries[key][0]) < history_id:
+                        self._remove(key)
+                        self.invalidations += 1
+
+    def invalidate(self, message_ids: List[str]):
+        with self._lock:
+            for message_id in message_ids:
+                for key in list(self._keys_by_message.get(message_id, ())):
+                    self._remove(key)
+                    self.invalidations += 1
+
+    def _remove(self, key: Tuple[str, str]):
+        _, size = self._entries.pop(key)
+        self._bytes -= size
+        keys = self._keys_by_message.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._keys_by_message[key[0]]
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations
+        }
@@ -0,0 +1,213 @@
+import os
+import time
+import uuid
+import atexit
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import get_settings
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+DICTIONARY_COLUMNS = ['message_id', 'correo', 'asunto', 'producto', 'moneda']
+
+
+def _schema():
+    return pa.schema([
+        ('message_id', pa.string()),
+        ('fecha', pa.timestamp('us', tz='UTC')),
+        ('correo', pa.string()),
+        ('asunto', pa.string()),
+        ('linea', pa.int32()),
+        ('producto', pa.string()),
+        ('cantidad', pa.int64()),
+        ('precio_unitario', pa.float64()),
+        ('total_producto', pa.float64()),
+        ('total_documento', pa.float64()),
+        ('moneda', pa.string()),
+    ])
+
+
+def _parse_fecha(fecha: str) -> Optional[datetime]:
+    try:
+        parsed = datetime.fromisoformat(fecha)
+    except (TypeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc)
+
+
+def document_rows(message_id: str, documento: Dict[str, Any]) -> Tuple[Tuple[str, str], List[Dict[str, Any]]]:
+    fecha = _parse_fecha(documento.get('fecha', ''))
+    mes = fecha.strftime('%Y-%m') if fecha else 'desconocido'
+    tipo = (documento.get('tipo_documento') or 'DESCONOCIDO').upper()
+    totales = documento.get('totales', {})
+    base = {
+        "message_id": message_id,
+        "fecha": fecha,
+        "correo": documento.get('correo', ''),
+        "asunto": documento.get('asunto', ''),
+        "total_documento": float(totales.get('total', 0.0) or 0.0),
+        "moneda": totales.get('moneda', ''),
+    }
+    productos = documento.get('productos', [])
+    rows = [
+        {
+            **base,
+            "linea": linea,
+            "producto": producto.get('nombre', ''),
+            "cantidad": int(producto.get('cantidad', 0) or 0),
+            "precio_unitario": float(producto.get('precio_unitario', 0.0) or 0.0),
+            "total_producto": float(producto.get('total', 0.0) or 0.0),
+        }
+        for linea, producto in enumerate(productos, start=1)
+    ]
+    if not rows:
+        rows.append({**base, "linea": 0, "producto": None, "cantidad": None,
+                     "precio_unitario": None, "total_producto": None})
+    return (mes, tipo), rows
+
+
+class ParquetSink:
+    def __init__(self, dataset_dir: str, flush_rows: int, flush_interval: float, compact_min_files: int):
+        self.dataset_dir = dataset_dir
+        self.flush_rows = flush_rows
+        self.flush_interval = flush_interval
+        self.compact_min_files = compact_min_files
+        self._buffers: Dict[str, Tuple[Tuple[str, str], List[Dict[str, Any]]]] = {}
+        self._buffered_rows = 0
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self.rows_written = 0
+        self.files_written = 0
+        self.compactions = 0
+        self.duplicates_dropped = 0
+        self.enabled = bool(dataset_dir)
+        if self.enabled and pa is None:
+            print("pyarrow no está instalado; se desactiva el dataset Parquet")
+            self.enabled = False
+        if self.enabled:
+            atexit.register(self.flush)
+
+    def _partition_dir(self, mes: str, tipo: str) -> str:
+        return os.path.join(self.dataset_dir, f"mes={mes}", f"tipo_documento={tipo}")
+
+    def append(self, message_id: str, documento: Dict[str, Any]):
+        if not self.enabled:
+            return
+        partition, rows = document_rows(message_id, documento)
+        with self._lock:
+            previous = self._buffers.pop(message_id, None)
+            if previous is not None:
+                self._buffered_rows -= len(previous[1])
+            self._buffers[message_id] = (partition, rows)
+            self._buffered_rows += len(rows)
+            due = (self._buffered_rows >= self.flush_rows
+                   or time.monotonic() - self._last_flush >= self.flush_interval)
+        if due:
+            self.flush()
+
+    def flush(self):
+        if not self.enabled:
+            return
+        with self._lock:
+            buffers, self._buffers = self._buffers, {}
+            self._buffered_rows = 0
+            self._last_flush = time.monotonic()
+
+            partitions: Dict[Tuple[str, str], List[Dict[str, Any]]] = {}
+            for partition, rows in buffers.values():
+                partitions.setdefault(partition, []).extend(rows)
+
+            for (mes, tipo), rows in partitions.items():
+                directory = self._partition_dir(mes, tipo)
+                try:
+                    os.makedirs(directory, exist_ok=True)
+                    table = pa.Table.from_pylist(rows, schema=_schema())
+                    self._write_table(table, directory)
+                    self.rows_written += len(rows)
+                    self.files_written += 1
+                    self._maybe_compact(directory)
+                except Exception as e:
+                    print(f"Error al escribir la partición Parquet {directory}: {e}")
+
+    def _write_table(self, table, directory: str) -> str:
+        path = os.path.join(directory, f"part-{int(time.time())}-{uuid.uuid4().hex[:8]}.parquet")
+        tmp_path = f"{path}.tmp"
+        pq.write_table(table, tmp_path, compression='zstd', use_dictionary=DICTIONARY_COLUMNS)
+        os.replace(tmp_path, path)
+        return path
+
+    def _deduplicate(self, tables: List[Any]):
+        newest: Dict[str, int] = {}
+        for position, table in enumerate(tables):
+            for message_id in table.column('message_id').to_pylist():
+                newest[message_id] = position
+
+        keep: Dict[Tuple[str, int], int] = {}
+        offset = 0
+        for position, table in enumerate(tables):
+            rows = zip(table.column('message_id').to_pylist(), table.column('linea').to_pylist())
+            for index, (message_id, linea) in enumerate(rows, start=offset):
+                if newest[message_id] == position:
+                    keep[(message_id, linea)] = index
+            offset += table.num_rows
+
+        table = pa.concat_tables(tables)
+        self.duplicates_dropped += table.num_rows - len(keep)
+        return table.take(sorted(keep.values()))
+
+    def _maybe_compact(self, directory: str):
+        files = sorted(
+            (os.path.join(directory, name) for name in os.listdir(directory)
+             if name.startswith('part-') and name.endswith('.parquet')),
+            key=lambda path: (os.path.getmtime(path), path)
+        )
+        if len(files) < self.compact_min_files:
+            return
+        table = self._deduplicate([pq.read_table(path, schema=_schema()) for path in files])
+        table = table.sort_by([('fecha', 'ascending'), ('message_id', 'ascending'), ('linea', 'ascending')])
+        self._write_table(table, directory)
+        for path in files:
+            os.remove(path)
+        self.compactions += 1
+
+    def compact(self):
+        if not self.enabled or not os.path.isdir(self.dataset_dir):
+            return
+        with self._lock:
+            for root, _, files in os.walk(self.dataset_dir):
+                if any(name.endswith('.parquet') for name in files):
+                    self._maybe_compact(root)
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "dataset_dir": self.dataset_dir,
+            "buffered_rows": self._buffered_rows,
+            "rows_written": self.rows_written,
+            "files_written": self.files_written,
+            "compactions": self.compactions,
+            "duplicates_dropped": self.duplicates_dropped
+        }
+
+
+_parquet_sink_instance: Optional[ParquetSink] = None
+
+def get_parquet_sink() -> ParquetSink:
+    global _parquet_sink_instance
+    if _parquet_sink_instance is None:
+        settings = get_settings()
+        _parquet_sink_instance = ParquetSink(
+            settings.PARQUET_DATASET_DIR if settings.PARQUET_ENABLED else "",
+            flush_rows=settings.PARQUET_FLUSH_ROWS,
+            flush_interval=settings.PARQUET_FLUSH_INTERVAL,
+            compact_min_files=settings.PARQUET_COMPACT_MIN_FILES
+        )
+    return _parquet_sink_instance
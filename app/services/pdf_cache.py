@@ -0,0 +1,144 @@
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+import pdfminer
+
+PARSER_VERSION = f"pdfminer.six-{pdfminer.__version__}+2"
+
+
+def pdf_cache_key(pdf_data: bytes) -> str:
+    return hashlib.sha256(pdf_data).hexdigest()
+
+
+class PDFCache:
+    def __init__(self, cache_dir: str, max_bytes: int, memory_entries: int = 64):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.memory_entries = memory_entries
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._memory: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.cache_dir) and self.max_bytes > 0
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _load_index(self):
+        if not self.enabled or not os.path.isdir(self.cache_dir):
+            return
+
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith('.json'):
+                    continue
+                try:
+                    stat = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime, name[:-5], stat.st_size))
+
+        for _, key, size in sorted(entries):
+            self._index[key] = size
+            self._bytes += size
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._index.move_to_end(key)
+                self.hits += 1
+                return self._memory[key]
+            if key not in self._index:
+                self.misses += 1
+                return None
+
+        path = self._path(key)
+        try:
+            with open(path, encoding='utf-8') as cached:
+                entry = json.load(cached)
+            os.utime(path)
+        except (OSError, ValueError):
+            entry = None
+
+        with self._lock:
+            if not entry or entry.get('parser_version') != PARSER_VERSION:
+                self._discard(key)
+                self.misses += 1
+                return None
+            self._index.move_to_end(key)
+            self._remember(key, entry)
+            self.hits += 1
+            return entry
+
+    def put(self, key: str, text: str, metadata: Optional[Dict[str, Any]], max_pages: int = 0) -> Dict[str, Any]:
+        entry = {"parser_version": PARSER_VERSION, "text": text, "metadata": metadata, "max_pages": max_pages}
+        if not self.enabled:
+            return entry
+
+        path = self._path(key)
+        data = json.dumps(entry, ensure_ascii=False).encode('utf-8')
+        if len(data) > self.max_bytes:
+            return entry
+
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as cached:
+                cached.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error al guardar el PDF en caché: {e}")
+            return entry
+
+        with self._lock:
+            self._bytes -= self._index.pop(key, 0)
+            self._index[key] = len(data)
+            self._bytes += len(data)
+            self._remember(key, entry)
+            while self._bytes > self.max_bytes and self._index:
+                oldest = next(iter(self._index))
+                self._discard(oldest)
+                self.evictions += 1
+        return entry
+
+    def _remember(self, key: str, entry: Dict[str, Any]):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def _discard(self, key: str):
+        self._bytes -= self._index.pop(key, 0)
+        self._memory.pop(key, None)
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def get_stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._index),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "evictions": self.evictions,
+            "parser_version": PARSER_VERSION
+        }
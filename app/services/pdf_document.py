@@ -0,0 +1,97 @@
+import io
+import itertools
+from typing import Dict, Any, Iterator, Optional
+from pdfminer.converter import TextConverter
+from pdfminer.layout import LAParams
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfinterp import PDFResourceManager, PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import resolve1
+from pdfminer.psparser import PSLiteral
+from pdfminer.utils import decode_text
+
+INFO_FIELDS = {
+    "title": "Title",
+    "author": "Author",
+    "subject": "Subject",
+    "creator": "Creator",
+    "producer": "Producer",
+    "creation_date": "CreationDate",
+    "modification_date": "ModDate",
+}
+
+
+def _info_value(value: Any) -> str:
+    value = resolve1(value)
+    if value is None:
+        return ""
+    if isinstance(value, bytes):
+        return decode_text(value)
+    if isinstance(value, PSLiteral):
+        return str(value.name)
+    return str(value)
+
+
+class ParsedPDF:
+    def __init__(self, pdf_data: bytes):
+        self._parser = PDFParser(io.BytesIO(pdf_data))
+        self.document = PDFDocument(self._parser)
+        self._text: Optional[str] = None
+        self._num_pages: Optional[int] = None
+        self._metadata: Optional[Dict[str, Any]] = None
+
+    def pages(self) -> Iterator[PDFPage]:
+        return PDFPage.create_pages(self.document)
+
+    def iter_page_texts(self, max_pages: int = 0, first_page: int = 0) -> Iterator[str]:
+        rsrcmgr = PDFResourceManager(caching=True)
+        with io.StringIO() as output:
+            device = TextConverter(rsrcmgr, output, codec="utf-8", laparams=LAParams())
+            interpreter = PDFPageInterpreter(rsrcmgr, device)
+            pages = itertools.islice(self.pages(), first_page, None)
+            for count, page in enumerate(pages, start=1):
+                interpreter.process_page(page)
+                page_text = output.getvalue()
+                output.seek(0)
+                output.truncate(0)
+                yield page_text
+                if max_pages and count >= max_pages:
+                    break
+
+    def extract_text(self, max_pages: int = 0) -> str:
+        if self._text is not None:
+            return self._text
+        page_texts = list(self.iter_page_texts(max_pages))
+        text = "".join(page_texts)
+        if not max_pages or len(page_texts) < max_pages:
+            self._text = text
+            if self._num_pages is None:
+                self._num_pages = len(page_texts)
+        return text
+
+    @property
+    def text(self) -> str:
+        return self.extract_text()
+
+    @property
+    def num_pages(self) -> int:
+        if self._num_pages is None:
+            pages = resolve1(self.document.catalog.get("Pages"))
+            count = resolve1(pages.get("Count")) if isinstance(pages, dict) else None
+            self._num_pages = count if isinstance(count, int) else sum(1 for _ in self.pages())
+        return self._num_pages
+
+    @property
+    def info(self) -> Dict[str, Any]:
+        return self.document.info[0] if self.document.info else {}
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        if self._metadata is None:
+            info = self.info
+            metadata: Dict[str, Any] = {"num_pages": self.num_pages}
+            for field, key in INFO_FIELDS.items():
+                metadata[field] = _info_value(info.get(key))
+            self._metadata = metadata
+        return self._metadata
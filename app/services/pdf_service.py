@@ -1,57 +1,154 @@
-import io
 import base64
-from typing import Optional, Dict, Any
-from pdfminer.high_level import extract_text
-from pdfminer.layout import LAParams
-from PyPDF2 import PdfReader
+from functools import partial
+from typing import Optional, Dict, Any, Iterator, List, Callable
+from app.core.config import get_settings
+from app.services.pdf_cache import PDFCache, pdf_cache_key
+from app.services.pdf_document import ParsedPDF
+from app.services.pdf_worker_pool import PDFWorkerPool
+
+def _open_pdf(pdf_data: bytes) -> ParsedPDF:
+    try:
+        return ParsedPDF(pdf_data)
+    except Exception as e:
+        raise ValueError(f"Error al abrir el PDF: {str(e)}")
+
+
+def _read_text(document: ParsedPDF, max_pages: int = 0) -> str:
+    try:
+        return document.extract_text(max_pages).strip()
+    except Exception as e:
+        raise ValueError(f"Error al extraer texto del PDF: {str(e)}")
+
+
+def _read_metadata(document: ParsedPDF) -> Dict[str, Any]:
+    try:
+        return document.metadata
+    except Exception as e:
+        raise ValueError(f"Error al obtener metadatos del PDF: {str(e)}")
+
+
+def _read_pdf_metadata(pdf_data: bytes) -> Dict[str, Any]:
+    return _read_metadata(_open_pdf(pdf_data))
+
+
+def _extract_pdf_entry(pdf_data: bytes, include_metadata: bool = True, max_pages: int = 0) -> Dict[str, Any]:
+    document = _open_pdf(pdf_data)
+    try:
+        pages = list(document.iter_page_texts(max_pages))
+    except Exception as e:
+        raise ValueError(f"Error al extraer texto del PDF: {str(e)}")
+    return {
+        "text": "".join(pages),
+        "metadata": _read_metadata(document) if include_metadata else None,
+        "complete": not max_pages or len(pages) < max_pages
+    }
+
+
+def _extract_pdf_content(pdf_data: bytes, include_metadata: bool = True, max_pages: int = 0) -> Dict[str, Any]:
+    content = _extract_pdf_entry(pdf_data, include_metadata, max_pages)
+    return {"text": content["text"].strip(), "metadata": content["metadata"]}
+
+
+def _iter_pdf_pages(pdf_data: bytes, max_pages: int = 0) -> Iterator[str]:
+    document = _open_pdf(pdf_data)
+    try:
+        yield from document.iter_page_texts(max_pages)
+    except Exception as e:
+        raise ValueError(f"Error al extraer texto del PDF: {str(e)}")
+
+
+def _covers(entry: Dict[str, Any], max_pages: int) -> bool:
+    cached_pages = entry.get('max_pages', 0)
+    return not cached_pages or bool(max_pages) and max_pages <= cached_pages
+
+
+def _split_pages(text: str) -> List[str]:
+    pages = text.split('\f')
+    if not pages[-1]:
+        pages.pop()
+    return [page.strip() for page in pages]
+
+
+def _slice_pages(text: str, max_pages: int) -> str:
+    return '\f'.join(text.split('\f')[:max_pages]).strip() if max_pages else text.strip()
 
 
 class PDFService:
     def __init__(self):
-        pass
+        settings = get_settings()
+        self.cache = PDFCache(settings.PDF_CACHE_DIR, settings.PDF_CACHE_MAX_BYTES)
+        self.pool = PDFWorkerPool(
+            settings.PDF_WORKERS,
+            settings.PDF_TIMEOUT_SECONDS,
+            settings.PDF_MAX_MEMORY_MB,
+            settings.PDF_MAX_JOBS_PER_WORKER
+        ) if settings.PDF_WORKERS > 0 else None
     
-    def extract_text(self, pdf_data: bytes) -> str:
-        try:
-            pdf_file = io.BytesIO(pdf_data)
-            laparams = LAParams()
-            text = extract_text(pdf_file, laparams=laparams)
-            return text.strip()
-        except Exception as e:
-            raise ValueError(f"Error al extraer texto del PDF: {str(e)}")
+    @staticmethod
+    def extract_text(pdf_data: bytes) -> str:
+        return _read_text(_open_pdf(pdf_data))
+    
+    @staticmethod
+    def get_pdf_metadata(pdf_data: bytes) -> Dict[str, Any]:
+        return _read_pdf_metadata(pdf_data)
     
-    def get_pdf_metadata(self, pdf_data: bytes) -> Dict[str, Any]:
+    def _run(self, job: Callable[[bytes], Any], pdf_data: bytes) -> Any:
+        return self.pool.run(job, pdf_data) if self.pool else job(pdf_data)
+    
+    def _stream(self, job: Callable[[bytes], Iterator[Any]], pdf_data: bytes) -> Iterator[Any]:
+        return self.pool.stream(job, pdf_data) if self.pool else job(pdf_data)
+    
+    def iter_pages(self, pdf_data: bytes, max_pages: int = 0) -> Iterator[str]:
+        key = pdf_cache_key(pdf_data)
+        entry = self.cache.get(key)
+        if entry is not None and _covers(entry, max_pages):
+            pages = _split_pages(entry['text'])
+            yield from (pages[:max_pages] if max_pages else pages)
+            return
+        
+        pages: List[str] = []
+        complete = False
+        stream = self._stream(partial(_iter_pdf_pages, max_pages=max_pages), pdf_data)
         try:
-            pdf_file = io.BytesIO(pdf_data)
-            reader = PdfReader(pdf_file)
-            metadata = reader.metadata or {}
-            
-            return {
-                "num_pages": len(reader.pages),
-                "title": metadata.get("/Title", ""),
-                "author": metadata.get("/Author", ""),
-                "subject": metadata.get("/Subject", ""),
-                "creator": metadata.get("/Creator", ""),
-                "producer": metadata.get("/Producer", ""),
-                "creation_date": str(metadata.get("/CreationDate", "")),
-                "modification_date": str(metadata.get("/ModDate", ""))
-            }
-        except Exception as e:
-            raise ValueError(f"Error al obtener metadatos del PDF: {str(e)}")
+            for page_text in stream:
+                pages.append(page_text)
+                yield page_text.strip()
+            complete = not max_pages or len(pages) < max_pages
+        finally:
+            stream.close()
+            if complete or len(pages) > (entry or {}).get('max_pages', 0):
+                metadata = entry['metadata'] if entry else None
+                self.cache.put(key, "".join(pages), metadata, 0 if complete else len(pages))
     
-    def process_pdf(self, pdf_data: bytes) -> Dict[str, Any]:
+    def process_pdf(self, pdf_data: bytes, include_metadata: bool = True, max_pages: int = 0) -> Dict[str, Any]:
         try:
-            text = self.extract_text(pdf_data)
-            metadata = self.get_pdf_metadata(pdf_data)
+            key = pdf_cache_key(pdf_data)
+            entry = self.cache.get(key)
+            if entry is not None and _covers(entry, max_pages):
+                text, metadata = _slice_pages(entry['text'], max_pages), entry['metadata']
+                if include_metadata and metadata is None:
+                    metadata = self._run(_read_pdf_metadata, pdf_data)
+                    self.cache.put(key, entry['text'], metadata, entry.get('max_pages', 0))
+            else:
+                job = partial(_extract_pdf_entry, include_metadata=include_metadata, max_pages=max_pages)
+                content = self._run(job, pdf_data)
+                text = content['text'].strip()
+                metadata = content['metadata'] or (entry['metadata'] if entry else None)
+                self.cache.put(key, content['text'], metadata, 0 if content['complete'] else max_pages)
             
             return {
                 "text": text,
-                "metadata": metadata,
+                "metadata": metadata or {},
                 "text_length": len(text),
                 "has_text": len(text.strip()) > 0
             }
         except Exception as e:
             raise ValueError(f"Error al procesar PDF: {str(e)}")
     
+    def shutdown(self):
+        if self.pool:
+            self.pool.shutdown()
+    
     def decode_base64_pdf(self, base64_data: str) -> bytes:
         try:
             if "," in base64_data:
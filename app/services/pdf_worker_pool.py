@@ -0,0 +1,246 @@
+import time
+import queue
+import signal
+import threading
+import multiprocessing
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, List, Optional, Tuple
+
+TIMEOUT_GRACE_SECONDS = 5.0
+
+
+class PDFJobTimeout(BaseException):
+    pass
+
+
+def _init_worker(max_memory_mb: int):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    if max_memory_mb > 0:
+        try:
+            import resource
+            limit = max_memory_mb * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def _on_timeout(signum, frame):
+    raise PDFJobTimeout("Tiempo límite excedido al procesar el PDF")
+
+
+@contextmanager
+def _deadline(timeout: float):
+    if timeout > 0:
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        yield
+    finally:
+        if timeout > 0:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+
+
+@contextmanager
+def _alarm_blocked():
+    signal.pthread_sigmask(signal.SIG_BLOCK, {signal.SIGALRM})
+    try:
+        yield
+    finally:
+        signal.pthread_sigmask(signal.SIG_UNBLOCK, {signal.SIGALRM})
+
+
+def _send(connection, reply: Tuple[bool, Any, bool]):
+    try:
+        connection.send(reply)
+    except Exception as e:
+        ok, value, done = reply
+        connection.send((False, ValueError(str(value) if not ok else f"Resultado no serializable: {e}"), True))
+
+
+def _worker_main(connection, max_memory_mb: int):
+    _init_worker(max_memory_mb)
+    while True:
+        try:
+            job = connection.recv()
+        except EOFError:
+            return
+        if job is None:
+            return
+
+        func, pdf_data, timeout, stream = job
+        try:
+            with _deadline(timeout):
+                if stream:
+                    for item in func(pdf_data):
+                        with _alarm_blocked():
+                            _send(connection, (True, item, False))
+                            proceed = connection.recv()
+                        if not proceed:
+                            break
+                    reply = (True, None, True)
+                else:
+                    reply = (True, func(pdf_data), True)
+        except BaseException as e:
+            reply = (False, e, True)
+        _send(connection, reply)
+
+
+class _Worker:
+    def __init__(self, context, max_memory_mb: int):
+        self.connection, child = context.Pipe()
+        self.process = context.Process(target=_worker_main, args=(child, max_memory_mb), daemon=True)
+        self.process.start()
+        child.close()
+        self.jobs = 0
+        self.lost = False
+
+    def stop(self):
+        try:
+            self.connection.send(None)
+        except Exception:
+            pass
+        self.process.join(1.0)
+        self.kill()
+
+    def kill(self):
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join(1.0)
+        self.connection.close()
+        self.lost = True
+
+
+class PDFWorkerPool:
+    def __init__(self, workers: int, timeout: float, max_memory_mb: int, max_jobs_per_worker: int):
+        self.workers = workers
+        self.timeout = timeout
+        self.max_memory_mb = max_memory_mb
+        self.max_jobs_per_worker = max_jobs_per_worker
+        self._context = multiprocessing.get_context('spawn')
+        self._idle: "queue.Queue[Optional[_Worker]]" = queue.Queue()
+        for _ in range(max(1, workers)):
+            self._idle.put(None)
+        self._live: List[_Worker] = []
+        self._lock = threading.Lock()
+        self.jobs = 0
+        self.timeouts = 0
+        self.crashes = 0
+        self.restarts = 0
+
+    def _spawn(self) -> _Worker:
+        worker = _Worker(self._context, self.max_memory_mb)
+        with self._lock:
+            self._live.append(worker)
+        return worker
+
+    def _discard(self, worker: _Worker, stop: bool = False):
+        with self._lock:
+            if worker in self._live:
+                self._live.remove(worker)
+        if stop:
+            worker.stop()
+        else:
+            worker.kill()
+            self.restarts += 1
+
+    def _start(self, job: Tuple[Any, ...]) -> _Worker:
+        with self._lock:
+            self.jobs += 1
+        worker = self._idle.get()
+        try:
+            if worker is None:
+                worker = self._spawn()
+            try:
+                worker.connection.send(job)
+            except (BrokenPipeError, OSError):
+                self._discard(worker)
+                worker = self._spawn()
+                worker.connection.send(job)
+        except BaseException:
+            self._idle.put(None if worker is None or worker.lost else worker)
+            raise
+        return worker
+
+    def _receive(self, worker: _Worker, deadline: Optional[float]) -> Tuple[bool, Any, bool]:
+        remaining = None if deadline is None else max(0.0, deadline - time.monotonic())
+        if not worker.connection.poll(remaining):
+            self.timeouts += 1
+            self._discard(worker)
+            raise ValueError(f"Tiempo límite de {self.timeout} s excedido al procesar el PDF; se reinició el proceso")
+        try:
+            return worker.connection.recv()
+        except (EOFError, OSError):
+            self.crashes += 1
+            self._discard(worker)
+            raise ValueError("El proceso que analizaba el PDF terminó inesperadamente (posible límite de memoria)")
+
+    def _release(self, worker: _Worker, finished: bool):
+        if not worker.lost and finished:
+            worker.jobs += 1
+            if self.max_jobs_per_worker and worker.jobs >= self.max_jobs_per_worker:
+                self._discard(worker, stop=True)
+        self._idle.put(None if worker.lost else worker)
+
+    def _unwrap(self, ok: bool, value: Any) -> Any:
+        if ok:
+            return value
+        if isinstance(value, PDFJobTimeout):
+            self.timeouts += 1
+            raise ValueError(f"Tiempo límite de {self.timeout} s excedido al procesar el PDF")
+        if isinstance(value, MemoryError):
+            raise ValueError(f"El PDF excedió el límite de memoria de {self.max_memory_mb} MB")
+        raise value
+
+    def _deadline(self) -> Optional[float]:
+        return time.monotonic() + self.timeout + TIMEOUT_GRACE_SECONDS if self.timeout > 0 else None
+
+    def run(self, func: Callable[[bytes], Any], pdf_data: bytes) -> Any:
+        worker = self._start((func, pdf_data, self.timeout, False))
+        finished = False
+        try:
+            ok, value, _ = self._receive(worker, self._deadline())
+            finished = True
+        finally:
+            self._release(worker, finished)
+        return self._unwrap(ok, value)
+
+    def stream(self, func: Callable[[bytes], Iterator[Any]], pdf_data: bytes) -> Iterator[Any]:
+        worker = self._start((func, pdf_data, self.timeout, True))
+        deadline = self._deadline()
+        finished = False
+        try:
+            while True:
+                ok, value, done = self._receive(worker, deadline)
+                if done:
+                    finished = True
+                    self._unwrap(ok, value)
+                    return
+                yield value
+                worker.connection.send(True)
+        finally:
+            if not finished and not worker.lost:
+                try:
+                    worker.connection.send(False)
+                    finished = self._receive(worker, deadline)[2]
+                except (ValueError, OSError):
+                    if not worker.lost:
+                        self._discard(worker)
+            self._release(worker, finished)
+
+    def shutdown(self):
+        with self._lock:
+            workers, self._live = self._live, []
+        for worker in workers:
+            worker.stop()
+
+    def get_stats(self) -> dict:
+        with self._lock:
+            alive = len(self._live)
+        return {
+            "workers": self.workers,
+            "alive": alive,
+            "jobs": self.jobs,
+            "timeouts": self.timeouts,
+            "crashes": self.crashes,
+            "restarts": self.restarts
+        }
@@ -0,0 +1,176 @@
+import asyncio
+from typing import Dict, Any, Optional, List, Tuple
+from googleapiclient.errors import HttpError
+from app.services.gmail_service import get_gmail_service
+from app.services.async_gmail_service import get_async_gmail_service
+from app.services.extraction_service import get_extraction_service
+from app.core.config import get_settings
+from app.services.label_service import get_label_service
+from app.services.label_queue import get_label_queue
+from app.services.parquet_sink import get_parquet_sink
+from app.services.document_store import get_document_store
+
+
+class ProcessingService:
+    def __init__(self):
+        self.settings = get_settings()
+        self.gmail_service = get_gmail_service()
+        self.extraction_service = get_extraction_service()
+        self.label_service = get_label_service()
+        self.label_queue = get_label_queue()
+        self.parquet_sink = get_parquet_sink()
+        self.document_store = get_document_store()
+
+    def process_message(self, message_id: str, debug: bool = False,
+                        message: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        stored = not debug and self.extraction_service.is_stored(message_id)
+        result = self.extraction_service.extract_structured_data(message_id, debug=debug, message=message)
+        tipo_documento = result.get('tipo_documento', '').upper()
+        if tipo_documento in ['PO', 'QUOTE']:
+            try:
+                if self.settings.LABEL_QUEUE_ENABLED:
+                    self.label_queue.enqueue(message_id, tipo_documento)
+                else:
+                    self.label_service.apply_label_to_message(message_id, tipo_documento)
+            except Exception as e:
+                print(f"Error al encolar etiqueta {tipo_documento} para el mensaje {message_id}: {e}")
+
+        result.pop('etiqueta_aplicada', None)
+        result.pop('error_etiqueta', None)
+        result.pop('email_json', None)
+        
+        if not stored:
+            try:
+                self.parquet_sink.append(message_id, result)
+            except Exception as e:
+                print(f"Error al agregar el mensaje {message_id} al dataset Parquet: {e}")
+        return result
+
+    @staticmethod
+    def _order_by_date(details: Dict[str, Dict[str, Any]]) -> List[Tuple[int, str]]:
+        ordered = []
+        for message_id, detail in details.items():
+            if 'error' in detail:
+                print(f"Error al obtener metadatos del mensaje {message_id}: {detail['error']}")
+            ordered.append((int(detail.get('response', {}).get('internalDate', 0)), message_id))
+        ordered.sort(reverse=True)
+        return ordered
+
+    @staticmethod
+    def _outcome(sync: Dict[str, Any], ordered: List[Tuple[int, str]],
+                 results: Dict[str, Any], errors: Dict[str, str], retry: List[str]) -> Dict[str, Any]:
+        return {
+            "message_ids": [message_id for _, message_id in ordered],
+            "results": results,
+            "errors": errors,
+            "retry": retry,
+            "history_id": sync['history_id'],
+            "full_resync": sync['full_resync']
+        }
+
+    @staticmethod
+    def _is_retryable(error: Exception) -> bool:
+        return not (isinstance(error, HttpError) and error.resp.status == 404)
+
+    def _should_retry(self, message_id: str, error: Exception) -> bool:
+        if not self._is_retryable(error):
+            return False
+        attempts = self.document_store.record_failure(message_id, str(error))
+        if attempts >= self.settings.GMAIL_SYNC_MAX_ATTEMPTS:
+            print(f"El mensaje {message_id} falló {attempts} veces; se registra como fallido y el historyId avanza")
+            return False
+        return True
+
+    def _advance_checkpoint(self, sync: Dict[str, Any], retry: List[str], processed: Optional[List[str]] = None):
+        self.document_store.clear_failures(processed or [])
+        if retry:
+            print(f"{len(retry)} mensajes fallaron; el historyId no avanza para reintentarlos en la próxima sincronización")
+            return
+        self.gmail_service.save_history_checkpoint(sync['history_id'])
+
+    def process_new_messages(self, debug: bool = False) -> Dict[str, Any]:
+        with self.gmail_service.sync_lock:
+            sync = self.gmail_service.sync_new_messages()
+            message_ids = sync['message_ids']
+            
+            details = self.gmail_service.batch_get_messages(
+                message_ids,
+                format='metadata',
+                metadata_headers=['Date']
+            ) if message_ids else {}
+            ordered = self._order_by_date(details)
+            
+            results = {}
+            errors = {}
+            retry = []
+            for _, message_id in ordered:
+                try:
+                    results[message_id] = self.process_message(message_id, debug=debug)
+                except Exception as e:
+                    print(f"Error al procesar el mensaje {message_id}: {e}")
+                    errors[message_id] = str(e)
+                    if self._should_retry(message_id, e):
+                        retry.append(message_id)
+            
+            self._advance_checkpoint(sync, retry, list(results))
+        
+        return self._outcome(sync, ordered, results, errors, retry)
+
+    async def process_new_messages_async(self, debug: bool = False) -> Dict[str, Any]:
+        async_gmail = get_async_gmail_service()
+        lock = self.gmail_service.sync_lock
+        acquire = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+        try:
+            await asyncio.shield(acquire)
+        except asyncio.CancelledError:
+            acquire.add_done_callback(lambda _: lock.release())
+            raise
+        
+        try:
+            sync = await asyncio.to_thread(self.gmail_service.sync_new_messages)
+            message_ids = sync['message_ids']
+            
+            details = await async_gmail.get_messages_json(
+                message_ids,
+                format='metadata',
+                metadata_headers=['Date']
+            ) if message_ids else {}
+            ordered = self._order_by_date(details)
+            by_format = {}
+            for _, message_id in ordered:
+                if self.extraction_service.is_stored(message_id):
+                    continue
+                size = details.get(message_id, {}).get('response', {}).get('sizeEstimate')
+                message_format = self.extraction_service.message_format(message_id, size=size, probe=False)
+                by_format.setdefault(message_format, []).append(message_id)
+            fetched = await asyncio.gather(*(
+                async_gmail.get_messages_json(ids, format=format) for format, ids in by_format.items()
+            ))
+            messages = {message_id: detail for batch in fetched for message_id, detail in batch.items()}
+            
+            results = {}
+            errors = {}
+            retry = []
+            for _, message_id in ordered:
+                try:
+                    message = messages.get(message_id, {}).get('response')
+                    results[message_id] = await asyncio.to_thread(self.process_message, message_id, debug, message)
+                except Exception as e:
+                    print(f"Error al procesar el mensaje {message_id}: {e}")
+                    errors[message_id] = str(e)
+                    if await asyncio.to_thread(self._should_retry, message_id, e):
+                        retry.append(message_id)
+            
+            await asyncio.to_thread(self._advance_checkpoint, sync, retry, list(results))
+        finally:
+            lock.release()
+        
+        return self._outcome(sync, ordered, results, errors, retry)
+
+_processing_service_instance: Optional[ProcessingService] = None
+
+def get_processing_service() -> ProcessingService:
+    global _processing_service_instance
+    if _processing_service_instance is None:
+        _processing_service_instance = ProcessingService()
+    return _processing_service_instance
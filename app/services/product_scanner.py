@@ -0,0 +1,291 @@
+import re
+from typing import Dict, Any, List, Optional
+from app.services.document_features import TextFeatures
+
+
+def _merge(patterns: List[str], flags: int = 0) -> "re.Pattern":
+    return re.compile("|".join(f"(?:{pattern})" for pattern in patterns), flags)
+
+
+_METADATA_RE = _merge([
+    r'(po\s*number|order\s*number|quote\s*number|n[uú]mero|n[oó]\.?):',
+    r'(date|fecha|order\s*date|delivery\s*date|valid\s*until):',
+    r'(phone|tel[eé]fono|mobile|cell):',
+    r'(email|e-mail|correo):',
+    r'(address|direcci[oó]n|shipping|billing):',
+    r'(vendor|supplier|proveedor|from|de):',
+    r'(bill\s*to|ship\s*to|to|para):',
+    r'(payment\s*terms|t[eé]rminos|currency|moneda):',
+    r'(authorized\s*by|signed|signature|firma):',
+    r'(subtotal|total|grand\s*total|monto|iva|tax|shipping|env[ií]o):',
+    r'(thank\s*you|gracias|regards|saludos|best\s*regards)',
+    r'\+?\d{1,4}[\s\-\(\)]?\d{1,4}[\s\-]?\d{1,4}[\s\-]?\d{1,4}[\s\-]?\d{1,4}',
+    r'[\w\.-]+@[\w\.-]+\.\w+',
+    r'(monday|tuesday|wednesday|thursday|friday|saturday|sunday|lunes|martes|mi[eé]rcoles|jueves|viernes|s[aá]bado|domingo)',
+    r'(january|february|march|april|may|june|july|august|september|october|november|december|enero|febrero|marzo|abril|mayo|junio|julio|agosto|septiembre|octubre|noviembre|diciembre)',
+])
+_SHORT_METADATA_RE = re.compile(r'[a-z\s]+:\s*\d+')
+
+_INVALID_NAME_RE = _merge([
+    r'(po\s*number|order\s*number|quote\s*number|n[uú]mero):',
+    r'(date|fecha|order\s*date):',
+    r'(phone|tel[eé]fono):',
+    r'(email|correo):',
+    r'(address|direcci[oó]n):',
+    r'(vendor|supplier|from|de):',
+    r'(bill\s*to|ship\s*to|to|para):',
+    r'(payment|currency|moneda):',
+    r'(authorized|signed|signature):',
+    r'\+?\d{1,4}',
+    r'[\w\.-]+@',
+    r'[a-z\s]{1,15}:\s*\d+$',
+])
+_SHORT_NAME_RE = re.compile(r':\s*\d+')
+
+_HEADER_NAME_RE = re.compile(r'(item|producto|description|descripci[oó]n|art[ií]culo)')
+_HEADER_VALUE_RE = re.compile(r'(qty|quantity|cantidad|price|precio|total|unit)')
+_SEPARATOR_RE = re.compile(r'[-=]+$|_{3,}')
+_FOOTER_RE = re.compile(r'(subtotal|total|grand total|monto total|iva|tax|shipping|env[ií]o)')
+
+_COLUMN_SPLIT_RE = re.compile(r'\s*\|\s*|\s{2,}|\t+')
+_NUMBER_RE = re.compile(r'[\d,]+\.?\d*')
+_COLUMN_NAME_PREFIX_RE = re.compile(r'^[\-\*\•\>\d\.\s]+')
+_BULLET_PREFIX_RE = re.compile(r'^[\-\*\•\>\s]+')
+_QTY_RE = re.compile(r'(?:Qty|Quantity|Cantidad|Cant)[\s:]*(\d+)', re.IGNORECASE)
+_PRICE_RE = re.compile(r'(?:Price|Precio|Unit|Unitario|P\.U\.)[\s:]*\$?\s*([\d,]+\.?\d*)', re.IGNORECASE)
+_KEYWORD_TAIL_RE = re.compile(r'(?:Qty|Quantity|Cantidad|Price|Precio|Unit|Unitario|P\.U\.).*', re.IGNORECASE)
+
+LINE_SKIP = "skip"
+LINE_HEADER = "header"
+LINE_SEPARATOR = "separator"
+LINE_FOOTER = "footer"
+LINE_CANDIDATE = "candidate"
+
+_REJECT = object()
+
+
+def is_metadata_line(line: str) -> bool:
+    return _is_metadata_lower(line.lower().strip())
+
+
+def _is_metadata_lower(line_lower: str) -> bool:
+    if _METADATA_RE.match(line_lower):
+        return True
+    return len(line_lower) < 10 and bool(_SHORT_METADATA_RE.match(line_lower))
+
+
+def is_valid_product_name(nombre: str) -> bool:
+    if not nombre or len(nombre) < 3:
+        return False
+    if _INVALID_NAME_RE.match(nombre.lower()):
+        return False
+    if len(nombre) < 5 and _SHORT_NAME_RE.search(nombre):
+        return False
+    return True
+
+
+class LineTokens:
+    def __init__(self, line: str, lines: List[str], index: int):
+        self.line = line
+        self.lines = lines
+        self.index = index
+        self._parts: Optional[List[str]] = None
+        self._number_matches: Optional[List["re.Match"]] = None
+
+    @property
+    def parts(self) -> List[str]:
+        if self._parts is None:
+            self._parts = [p.strip() for p in _COLUMN_SPLIT_RE.split(self.line) if p.strip()]
+        return self._parts
+
+    @property
+    def number_matches(self) -> List["re.Match"]:
+        if self._number_matches is None:
+            self._number_matches = list(_NUMBER_RE.finditer(self.line))
+        return self._number_matches
+
+
+def _build_product(nombre: str, numbers: List[float]) -> Optional[Dict[str, Any]]:
+    cantidad = int(numbers[0]) if numbers[0] < 10000 else int(numbers[0] / 100)
+    precio_unitario = numbers[1] if numbers[1] < 100000 else numbers[1] / 100
+
+    if len(numbers) >= 3:
+        total = numbers[2] if numbers[2] < 1000000 else numbers[2] / 100
+    else:
+        total = cantidad * precio_unitario
+
+    if cantidad > 0 and cantidad < 10000 and precio_unitario > 0 and precio_unitario < 100000:
+        return {
+            "nombre": nombre[:100],
+            "cantidad": cantidad,
+            "precio_unitario": round(precio_unitario, 2),
+            "total": round(total, 2)
+        }
+    return None
+
+
+def delimited_columns_stage(tokens: LineTokens):
+    parts = tokens.parts
+    if len(parts) < 3:
+        return None
+
+    nombre = _COLUMN_NAME_PREFIX_RE.sub('', parts[0]).strip()
+    if not is_valid_product_name(nombre):
+        return _REJECT
+
+    numbers = []
+    for part in parts[1:]:
+        num_match = _NUMBER_RE.search(part.replace('$', '').replace(',', ''))
+        if num_match:
+            try:
+                num_val = float(num_match.group(0).replace(',', ''))
+                if num_val > 0:
+                    numbers.append(num_val)
+            except:
+                continue
+
+    if len(numbers) >= 2:
+        try:
+            return _build_product(nombre, numbers)
+        except:
+            pass
+    return None
+
+
+def inline_numbers_stage(tokens: LineTokens):
+    matches = tokens.number_matches
+    if len(matches) < 2:
+        return None
+
+    try:
+        nombre = tokens.line[:matches[0].start()].strip()
+        nombre = _BULLET_PREFIX_RE.sub('', nombre).strip()
+
+        if not is_valid_product_name(nombre):
+            return _REJECT
+
+        nums = []
+        for match in matches:
+            try:
+                num_val = float(match.group(0).replace(',', ''))
+                if num_val > 0:
+                    nums.append(num_val)
+            except:
+                continue
+
+        if len(nums) >= 2:
+            return _build_product(nombre, nums)
+    except (ValueError, IndexError):
+        pass
+    return None
+
+
+def qty_price_keywords_stage(tokens: LineTokens):
+    line = tokens.line
+    qty_match = _QTY_RE.search(line)
+    if not qty_match:
+        return None
+    price_match = _PRICE_RE.search(line)
+    if not price_match:
+        return None
+
+    nombre_part = _KEYWORD_TAIL_RE.sub('', line).strip()
+    if not nombre_part or len(nombre_part) < 2:
+        if tokens.index > 0:
+            prev_line = tokens.lines[tokens.index - 1].strip()
+            if prev_line and len(prev_line) > 2:
+                nombre_part = prev_line[:100]
+
+    nombre_part = nombre_part or "Producto sin nombre"
+    nombre_part = _BULLET_PREFIX_RE.sub('', nombre_part).strip()
+
+    if not is_valid_product_name(nombre_part):
+        return _REJECT
+
+    try:
+        cantidad = int(qty_match.group(1))
+        precio_unitario = float(price_match.group(1).replace(',', ''))
+
+        if cantidad > 0 and cantidad < 10000 and precio_unitario > 0 and precio_unitario < 100000:
+            return {
+                "nombre": nombre_part[:100],
+                "cantidad": cantidad,
+                "precio_unitario": round(precio_unitario, 2),
+                "total": round(cantidad * precio_unitario, 2)
+            }
+    except:
+        pass
+    return None
+
+
+DEFAULT_STAGES = (delimited_columns_stage, inline_numbers_stage, qty_price_keywords_stage)
+
+
+class ProductLineScanner:
+    def __init__(self, stages=DEFAULT_STAGES):
+        self.stages = stages
+
+    def classify_line(self, line: str, table_started: bool, line_lower: Optional[str] = None,
+                      has_keywords: bool = True) -> str:
+        if len(line) < 3:
+            return LINE_SKIP
+
+        if line_lower is None:
+            line_lower = line.lower()
+        if _is_metadata_lower(line_lower):
+            return LINE_SKIP
+
+        if has_keywords and _HEADER_NAME_RE.search(line_lower) and _HEADER_VALUE_RE.search(line_lower):
+            return LINE_HEADER
+
+        if table_started:
+            if _SEPARATOR_RE.match(line):
+                return LINE_SEPARATOR
+            if has_keywords and _FOOTER_RE.search(line_lower):
+                return LINE_FOOTER
+
+        return LINE_CANDIDATE
+
+    def scan(self, text: str) -> List[Dict[str, Any]]:
+        return self.scan_features(TextFeatures(text))
+
+    def scan_features(self, features: TextFeatures) -> List[Dict[str, Any]]:
+        products = []
+        lines = features.lines
+        lower_lines = features.lower_lines
+        keyword_lines = features.keyword_lines
+        table_started = False
+
+        for i in features.candidate_lines:
+            line = lines[i].strip()
+            if not line:
+                continue
+
+            kind = self.classify_line(line, table_started, lower_lines[i].strip(), i in keyword_lines)
+            if kind == LINE_HEADER:
+                table_started = True
+                continue
+            if kind == LINE_FOOTER:
+                table_started = False
+                continue
+            if kind != LINE_CANDIDATE:
+                continue
+
+            tokens = LineTokens(line, lines, i)
+            for stage in self.stages:
+                product = stage(tokens)
+                if product is _REJECT:
+                    break
+                if product is not None:
+                    products.append(product)
+                    break
+
+        seen = set()
+        unique_products = []
+        for p in products:
+            key = (p["nombre"].lower(), p["cantidad"], p["precio_unitario"])
+            if key not in seen:
+                seen.add(key)
+                unique_products.append(p)
+
+        return unique_products
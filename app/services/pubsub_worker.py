@@ -0,0 +1,167 @@
+import json
+import time
+import threading
+from typing import Dict, Any, Optional
+from google.cloud import pubsub_v1
+
+from app.core.config import get_settings
+from app.services.gmail_service import get_gmail_service
+from app.services.processing_service import get_processing_service
+from app.services.quota_scheduler import quota_priority, PRIORITY_BACKGROUND
+
+
+class GmailPubSubWorker:
+    def __init__(self):
+        self.settings = get_settings()
+        self.gmail_service = get_gmail_service()
+        self.processing_service = get_processing_service()
+        self.watch_expiration: Optional[int] = None
+        self._subscriber = None
+        self._streaming_future = None
+        self._renew_timer: Optional[threading.Timer] = None
+        self._lock = threading.Lock()
+        self._deliveries: Dict[str, int] = {}
+
+    def register_watch(self) -> Dict[str, Any]:
+        if not self.settings.GMAIL_PUBSUB_TOPIC_PATH:
+            raise ValueError("GMAIL_PUBSUB_PROJECT_ID y GMAIL_PUBSUB_TOPIC_ID son necesarios para registrar el watch")
+
+        self.gmail_service.build_service()
+        body = {'topicName': self.settings.GMAIL_PUBSUB_TOPIC_PATH}
+        if self.settings.GMAIL_WATCH_LABEL_IDS_LIST:
+            body['labelIds'] = self.settings.GMAIL_WATCH_LABEL_IDS_LIST
+            body['labelFilterBehavior'] = 'INCLUDE'
+
+        response = self.gmail_service.execute(self.gmail_service.service.users().watch(userId='me', body=body))
+        self.watch_expiration = int(response.get('expiration', 0))
+        if not self.gmail_service.load_history_checkpoint() and response.get('historyId'):
+            self.gmail_service.save_history_checkpoint(response['historyId'])
+        self._schedule_renewal()
+        return response
+
+    def _schedule_renewal(self, delay: Optional[float] = None):
+        if delay is None:
+            expires_in = (self.watch_expiration or 0) / 1000 - time.time()
+            delay = max(60.0, expires_in - self.settings.GMAIL_WATCH_RENEW_MARGIN_SECONDS)
+
+        with self._lock:
+            if self._renew_timer:
+                self._renew_timer.cancel()
+            self._renew_timer = threading.Timer(delay, self._renew_watch)
+            self._renew_timer.daemon = True
+            self._renew_timer.start()
+
+    def _renew_watch(self):
+        try:
+            self.register_watch()
+        except Exception as e:
+            print(f"Error al renovar el watch de Gmail, se reintentará: {e}")
+            self._schedule_renewal(300.0)
+
+    def handle_notification(self, data: Dict[str, Any]) -> Dict[str, Any]:
+        outcome = self.processing_service.process_new_messages()
+        if outcome['message_ids']:
+            print(
+                f"Notificación historyId={data.get('historyId')}: "
+                f"{len(outcome['results'])} correos procesados, {len(outcome['errors'])} con error"
+            )
+        return outcome
+
+    def _delivery_attempt(self, message) -> int:
+        attempt = getattr(message, 'delivery_attempt', None)
+        if attempt:
+            return attempt
+        with self._lock:
+            attempt = self._deliveries.get(message.message_id, 0) + 1
+            self._deliveries[message.message_id] = attempt
+        return attempt
+
+    def _ack(self, message):
+        with self._lock:
+            self._deliveries.pop(message.message_id, None)
+        message.ack()
+
+    def _retry_or_ack(self, message, reason: str):
+        attempt = self._delivery_attempt(message)
+        limit = self.settings.GMAIL_PUBSUB_MAX_DELIVERY_ATTEMPTS
+        if limit and attempt >= limit:
+            print(f"{reason}; se descarta la notificación tras {attempt} entregas")
+            self._ack(message)
+            return
+        print(f"{reason}; se pide reenvío a Pub/Sub")
+        message.nack()
+
+    def _callback(self, message):
+        try:
+            data = json.loads(message.data.decode('utf-8')) if message.data else {}
+        except ValueError as e:
+            print(f"Notificación de Pub/Sub con datos inválidos, se descarta: {e}")
+            self._ack(message)
+            return
+        try:
+            with quota_priority(PRIORITY_BACKGROUND):
+                outcome = self.handle_notification(data)
+            if outcome['retry']:
+                self._retry_or_ack(
+                    message, f"Notificación historyId={data.get('historyId')} con {len(outcome['retry'])} mensajes por reintentar"
+                )
+                return
+            self._ack(message)
+        except Exception as e:
+            self._retry_or_ack(message, f"Error al procesar notificación de Pub/Sub: {e}")
+
+    def start(self):
+        subscription_path = self.settings.GMAIL_PUBSUB_SUBSCRIPTION_PATH
+        if not subscription_path:
+            raise ValueError("GMAIL_PUBSUB_PROJECT_ID y GMAIL_PUBSUB_SUBSCRIPTION_ID son necesarios para iniciar el worker")
+
+        if self.settings.GMAIL_WATCH_ENABLED:
+            self.register_watch()
+
+        flow_control = pubsub_v1.types.FlowControl(
+            max_messages=self.settings.GMAIL_PUBSUB_MAX_MESSAGES,
+            max_bytes=self.settings.GMAIL_PUBSUB_MAX_BYTES
+        )
+        self._subscriber = pubsub_v1.SubscriberClient()
+        self._streaming_future = self._subscriber.subscribe(
+            subscription_path,
+            callback=self._callback,
+            flow_control=flow_control
+        )
+        return self._streaming_future
+
+    def run_forever(self):
+        future = self.start()
+        try:
+            future.result()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.stop()
+
+    def stop(self):
+        with self._lock:
+            if self._renew_timer:
+                self._renew_timer.cancel()
+                self._renew_timer = None
+
+        if self._streaming_future:
+            self._streaming_future.cancel()
+            try:
+                self._streaming_future.result(timeout=30)
+            except Exception:
+                pass
+            self._streaming_future = None
+
+        if self._subscriber:
+            self._subscriber.close()
+            self._subscriber = None
+
+
+_pubsub_worker_instance: Optional[GmailPubSubWorker] = None
+
+def get_pubsub_worker() -> GmailPubSubWorker:
+    global _pubsub_worker_instance
+    if _pubsub_worker_instance is None:
+        _pubsub_worker_instance = GmailPubSubWorker()
+    return _pubsub_worker_instance
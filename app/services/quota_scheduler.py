@@ -0,0 +1,231 @@
+import time
+import heapq
+import random
+import asyncio
+import itertools
+import threading
+import contextvars
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Tuple
+from app.core.config import get_settings
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BACKGROUND = 1
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_BACKGROUND: "background"}
+
+QUOTA_COSTS = {
+    'gmail.users.getProfile': 1,
+    'gmail.users.watch': 100,
+    'gmail.users.stop': 50,
+    'gmail.users.history.list': 2,
+    'gmail.users.labels.list': 1,
+    'gmail.users.labels.get': 1,
+    'gmail.users.labels.create': 5,
+    'gmail.users.labels.update': 5,
+    'gmail.users.labels.patch': 5,
+    'gmail.users.labels.delete': 5,
+    'gmail.users.messages.list': 5,
+    'gmail.users.messages.get': 5,
+    'gmail.users.messages.attachments.get': 5,
+    'gmail.users.messages.modify': 5,
+    'gmail.users.messages.batchModify': 50,
+    'gmail.users.messages.send': 100,
+}
+DEFAULT_QUOTA_COST = 5
+RATE_LIMIT_REASONS = ('rateLimitExceeded', 'userRateLimitExceeded')
+MIN_RATE_FRACTION = 0.1
+RATE_RECOVERY_PER_SECOND = 0.02
+
+_priority: contextvars.ContextVar = contextvars.ContextVar('gmail_quota_priority', default=PRIORITY_INTERACTIVE)
+
+
+def quota_cost(method_id: Optional[str]) -> int:
+    return QUOTA_COSTS.get(method_id or '', DEFAULT_QUOTA_COST)
+
+
+def is_rate_limited(status: int, content: Any = "") -> bool:
+    if status == 429:
+        return True
+    if status != 403:
+        return False
+    if isinstance(content, bytes):
+        content = content.decode('utf-8', errors='replace')
+    return any(reason in str(content) for reason in RATE_LIMIT_REASONS)
+
+
+@contextmanager
+def quota_priority(priority: int):
+    token = _priority.set(priority)
+    try:
+        yield
+    finally:
+        _priority.reset(token)
+
+
+class QuotaScheduler:
+    def __init__(self, units_per_second: float, burst: int, max_retries: int = 5,
+                 backoff_base: float = 1.0, backoff_max: float = 60.0):
+        self.max_rate = float(units_per_second)
+        self.rate = self.max_rate
+        self.capacity = float(max(burst, max(QUOTA_COSTS.values())))
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._paused_until = 0.0
+        self._throttle_streak = 0
+        self._waiting: List[Tuple[int, int]] = []
+        self._sequence = itertools.count()
+        self._condition = threading.Condition()
+        self.granted_requests = 0
+        self.granted_units = 0
+        self.delayed_requests = 0
+        self.wait_seconds = 0.0
+        self.throttled = 0
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        self._updated = now
+        if self.rate < self.max_rate:
+            self.rate = min(self.max_rate, self.rate + self.max_rate * RATE_RECOVERY_PER_SECOND * elapsed)
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+
+    def _try_grant(self, ticket: Tuple[int, int], cost: float, final: bool = True) -> float:
+        now = time.monotonic()
+        self._refill(now)
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._waiting[0] != ticket:
+            return max(0.005, cost / self.rate)
+        if self._tokens >= cost:
+            self._tokens -= cost
+            if final:
+                heapq.heappop(self._waiting)
+            return 0.0
+        return (cost - self._tokens) / self.rate
+
+    def _granted(self, cost: float, waited: float):
+        self.granted_requests += 1
+        self.granted_units += int(cost)
+        if waited > 0:
+            self.delayed_requests += 1
+            self.wait_seconds += waited
+        self._condition.notify_all()
+
+    def _withdraw(self, ticket: Tuple[int, int]):
+        if ticket in self._waiting:
+            self._waiting.remove(ticket)
+            heapq.heapify(self._waiting)
+            self._condition.notify_all()
+
+    def _draws(self, cost: float) -> List[Tuple[float, bool]]:
+        draws = []
+        remaining = float(cost)
+        while remaining > self.capacity:
+            draws.append((self.capacity, False))
+            remaining -= self.capacity
+        draws.append((remaining, True))
+        return draws
+
+    def acquire(self, cost: float, priority: Optional[int] = None):
+        priority = _priority.get() if priority is None else priority
+        cost = float(cost)
+        started = time.monotonic()
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+            delayed = False
+            try:
+                for draw, final in self._draws(cost):
+                    while True:
+                        wait = self._try_grant(ticket, draw, final)
+                        if wait <= 0:
+                            break
+                        delayed = True
+                        self._condition.wait(wait)
+            except BaseException:
+                self._withdraw(ticket)
+                raise
+            self._granted(cost, time.monotonic() - started if delayed else 0.0)
+
+    async def acquire_async(self, cost: float, priority: Optional[int] = None):
+        priority = _priority.get() if priority is None else priority
+        cost = float(cost)
+        started = time.monotonic()
+        with self._condition:
+            ticket = (priority, next(self._sequence))
+            heapq.heappush(self._waiting, ticket)
+        delayed = False
+        try:
+            for draw, final in self._draws(cost):
+                while True:
+                    with self._condition:
+                        wait = self._try_grant(ticket, draw, final)
+                        if wait <= 0:
+                            if final:
+                                self._granted(cost, time.monotonic() - started if delayed else 0.0)
+                            break
+                    delayed = True
+                    await asyncio.sleep(wait)
+        except BaseException:
+            with self._condition:
+                self._withdraw(ticket)
+            raise
+
+    def backoff(self) -> float:
+        with self._condition:
+            self.throttled += 1
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+
+            self._throttle_streak += 1
+            ceiling = min(self.backoff_max, self.backoff_base * (2 ** (self._throttle_streak - 1)))
+            delay = ceiling / 2 + random.uniform(0, ceiling / 2)
+            self._paused_until = now + delay
+            self.rate = max(self.max_rate * MIN_RATE_FRACTION, self.rate / 2)
+            self._tokens = 0.0
+            return delay
+
+    def succeeded(self):
+        self._throttle_streak = 0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._condition:
+            now = time.monotonic()
+            self._refill(now)
+            waiting = {name: 0 for name in PRIORITY_NAMES.values()}
+            for priority, _ in self._waiting:
+                name = PRIORITY_NAMES.get(priority, str(priority))
+                waiting[name] = waiting.get(name, 0) + 1
+            return {
+                "units_per_second": self.max_rate,
+                "current_rate": round(self.rate, 2),
+                "capacity": self.capacity,
+                "available_units": round(self._tokens, 2),
+                "paused_seconds": round(max(0.0, self._paused_until - now), 2),
+                "waiting": waiting,
+                "granted_requests": self.granted_requests,
+                "granted_units": self.granted_units,
+                "delayed_requests": self.delayed_requests,
+                "wait_seconds": round(self.wait_seconds, 2),
+                "throttled": self.throttled
+            }
+
+
+_quota_scheduler_instance: Optional[QuotaScheduler] = None
+
+def get_quota_scheduler() -> QuotaScheduler:
+    global _quota_scheduler_instance
+    if _quota_scheduler_instance is None:
+        settings = get_settings()
+        _quota_scheduler_instance = QuotaScheduler(
+            settings.GMAIL_QUOTA_UNITS_PER_SECOND,
+            settings.GMAIL_QUOTA_BURST,
+            max_retries=settings.GMAIL_QUOTA_MAX_RETRIES,
+            backoff_base=settings.GMAIL_QUOTA_BACKOFF_BASE,
+            backoff_max=settings.GMAIL_QUOTA_BACKOFF_MAX
+        )
+    return _quota_scheduler_instance
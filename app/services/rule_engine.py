@@ -0,0 +1,82 @@
+import os
+import re
+import json
+import time
+import threading
+from typing import Dict, Optional, Pattern
+
+from app.core.config import get_settings
+
+
+class RuleSet:
+    def __init__(self, version: int, families: Dict[str, Pattern]):
+        self.version = version
+        self.families = families
+
+    def search(self, family: str, text: str) -> bool:
+        pattern = self.families.get(family)
+        return bool(pattern and pattern.search(text))
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "RuleSet":
+        families = {}
+        for name, family in data.get("families", {}).items():
+            patterns = family.get("patterns", [])
+            if not patterns:
+                continue
+            flags = re.IGNORECASE if family.get("ignore_case") else 0
+            combined = "|".join(f"(?:{pattern})" for pattern in patterns)
+            families[name] = re.compile(combined, flags)
+        return cls(int(data.get("version", 0)), families)
+
+
+class RuleEngine:
+    def __init__(self, rules_file: Optional[str] = None, reload_interval: Optional[float] = None):
+        settings = get_settings()
+        self.rules_file = rules_file or settings.CLASSIFICATION_RULES_FILE
+        self.reload_interval = (
+            settings.CLASSIFICATION_RULES_RELOAD_INTERVAL if reload_interval is None else reload_interval
+        )
+        self._lock = threading.Lock()
+        self._mtime: float = 0.0
+        self._checked_at: float = 0.0
+        self._rules = self._load()
+
+    def _load(self) -> RuleSet:
+        try:
+            self._mtime = os.path.getmtime(self.rules_file)
+            with open(self.rules_file, encoding="utf-8") as rules:
+                return RuleSet.from_dict(json.load(rules))
+        except Exception as e:
+            raise ValueError(f"Error al cargar reglas de clasificación {self.rules_file}: {str(e)}")
+
+    def reload(self) -> RuleSet:
+        with self._lock:
+            self._rules = self._load()
+            return self._rules
+
+    def get_rules(self) -> RuleSet:
+        if self.reload_interval < 0:
+            return self._rules
+
+        now = time.monotonic()
+        if now - self._checked_at < self.reload_interval:
+            return self._rules
+
+        with self._lock:
+            self._checked_at = now
+            try:
+                if os.path.getmtime(self.rules_file) != self._mtime:
+                    self._rules = self._load()
+            except Exception as e:
+                print(f"Error al recargar reglas de clasificación, se mantienen las anteriores: {e}")
+        return self._rules
+
+
+_rule_engine_instance: Optional[RuleEngine] = None
+
+def get_rule_engine() -> RuleEngine:
+    global _rule_engine_instance
+    if _rule_engine_instance is None:
+        _rule_engine_instance = RuleEngine()
+    return _rule_engine_instance
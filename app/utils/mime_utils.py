@@ -0,0 +1,87 @@
+import base64
+from email import message_from_bytes, policy
+from email.message import Message
+from typing import Dict, List, Any, Iterator
+
+
+def b64url_decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + '=' * (-len(data) % 4))
+
+
+def decode_bytes(data: bytes, charset: str) -> str:
+    try:
+        return data.decode(charset or 'utf-8', errors='ignore')
+    except LookupError:
+        return data.decode('utf-8', errors='ignore')
+
+
+def walk_payload(payload: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+    stack = [payload]
+    while stack:
+        part = stack.pop()
+        children = part.get('parts')
+        if children:
+            stack.extend(reversed(children))
+        else:
+            yield part
+
+
+def payload_charset(part: Dict[str, Any]) -> str:
+    for header in part.get('headers', []):
+        if header.get('name', '').lower() == 'content-type':
+            message = Message()
+            message['Content-Type'] = header.get('value', '')
+            return message.get_content_charset() or 'utf-8'
+    return 'utf-8'
+
+
+def is_attachment_part(filename: str, mime_type: str, disposition: str = '') -> bool:
+    return bool(filename) or disposition == 'attachment' or mime_type == 'application/pdf'
+
+
+def parse_raw_message(raw: str) -> Dict[str, Any]:
+    message = message_from_bytes(b64url_decode(raw), policy=policy.default)
+    parsed: Dict[str, Any] = {
+        "headers": {name: str(message.get(name, '')) for name in ('Subject', 'From', 'To', 'Date')},
+        "plain": [],
+        "html": [],
+        "attachments": []
+    }
+
+    for part in message.walk():
+        if part.is_multipart():
+            continue
+        mime_type = part.get_content_type()
+        filename = part.get_filename() or ''
+        data = part.get_payload(decode=True) or b''
+
+        if is_attachment_part(filename, mime_type, part.get_content_disposition() or ''):
+            parsed["attachments"].append({
+                "filename": filename,
+                "mime_type": mime_type,
+                "size": len(data),
+                "data": data
+            })
+        elif mime_type == 'text/plain':
+            parsed["plain"].append(decode_bytes(data, part.get_content_charset()))
+        elif mime_type == 'text/html':
+            parsed["html"].append(decode_bytes(data, part.get_content_charset()))
+
+    return parsed
+
+
+def payload_text_parts(payload: Dict[str, Any]) -> Dict[str, List[str]]:
+    texts: Dict[str, List[str]] = {"plain": [], "html": []}
+    for part in walk_payload(payload):
+        mime_type = part.get('mimeType', '')
+        if part.get('filename') or mime_type not in ('text/plain', 'text/html'):
+            continue
+        data = part.get('body', {}).get('data', '')
+        if not data:
+            continue
+        try:
+            decoded = decode_bytes(b64url_decode(data), payload_charset(part))
+        except ValueError:
+            continue
+        texts["plain" if mime_type == 'text/plain' else "html"].append(decoded)
+    return texts
@@ -1,50 +1,107 @@
 import re
-import html
-from html.parser import HTMLParser
+from html import unescape
+from typing import List
 
+SKIP_TAGS = frozenset(['script', 'style', 'noscript', 'template'])
+BLOCK_TAGS = frozenset([
+    'tr', 'li', 'br', 'p', 'div', 'table', 'tbody', 'thead', 'ul', 'ol', 'hr',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'blockquote', 'pre', 'section', 'article',
+    'header', 'footer', 'title'
+])
+CELL_TAGS = frozenset(['td', 'th'])
 
-class HTMLTextExtractor(HTMLParser):
-    def __init__(self):
-        super().__init__()
-        self.text = []
-        self.in_table = False
-        self.in_list = False
-        self.current_line = []
-        
+_TAG_RE = re.compile(
+    r'<(?:!--.*?(?:-->|$)|!\[CDATA\[.*?(?:\]\]>|$)|[!?][^<>]*>'
+    r'|(/?)([a-zA-Z][a-zA-Z0-9:-]*)(?:[^<>"\']|"[^"<]*"|\'[^\'<]*\')*>)',
+    re.DOTALL
+)
+_SKIP_END_RE = {tag: re.compile(rf'</{tag}\s*>', re.IGNORECASE) for tag in SKIP_TAGS}
+
+
+class TextLimitReached(Exception):
+    pass
+
+
+class HTMLTextExtractor:
+    def __init__(self, keep_lines: bool = False, max_chars: int = 0):
+        self.keep_lines = keep_lines
+        self.max_chars = max_chars
+        self.lines: List[str] = []
+        self.current_line: List[str] = []
+        self.current_cell: List[str] = []
+        self.size = 0
+        self.truncated = False
+    
+    def feed(self, html_content: str):
+        pos = 0
+        text_start = 0
+        length = len(html_content)
+        while pos < length:
+            start = html_content.find('<', pos)
+            if start < 0:
+                break
+            match = _TAG_RE.match(html_content, start)
+            if not match:
+                pos = start + 1
+                continue
+            if start > text_start:
+                self.handle_data(html_content[text_start:start])
+            pos = text_start = match.end()
+            
+            tag = match.group(2)
+            if not tag:
+                continue
+            tag = tag.lower()
+            if match.group(1):
+                self.handle_endtag(tag)
+            elif tag in SKIP_TAGS:
+                if not match.group(0).endswith('/>'):
+                    skip_end = _SKIP_END_RE[tag].search(html_content, pos)
+                    pos = text_start = skip_end.end() if skip_end else length
+            else:
+                self.handle_starttag(tag)
+        if text_start < length:
+            self.handle_data(html_content[text_start:])
+    
     def handle_data(self, data):
-        if data.strip():
-            self.current_line.append(data.strip())
+        if '&' in data:
+            data = unescape(data)
+        words = data.split()
+        if not words:
+            return
+        chunk = ' '.join(words)
+        self.current_cell.append(chunk)
+        self.size += len(chunk) + 1
+        if self.max_chars and self.size >= self.max_chars:
+            self.truncated = True
+            raise TextLimitReached()
     
-    def handle_starttag(self, tag, attrs):
-        if tag in ['table', 'tbody', 'thead']:
-            self.in_table = True
-        elif tag in ['ul', 'ol']:
-            self.in_list = True
-        elif tag in ['tr', 'li', 'br', 'p', 'div']:
-            if self.current_line:
-                line = ' '.join(self.current_line).strip()
-                if line:
-                    self.text.append(line)
-                self.current_line = []
+    def handle_starttag(self, tag):
+        if tag in BLOCK_TAGS:
+            self._end_line()
+        elif tag in CELL_TAGS:
+            self._end_cell()
     
     def handle_endtag(self, tag):
-        if tag in ['table', 'tbody', 'thead']:
-            self.in_table = False
-        elif tag in ['ul', 'ol']:
-            self.in_list = False
-        elif tag in ['tr', 'li', 'p', 'div']:
-            if self.current_line:
-                line = ' '.join(self.current_line).strip()
-                if line:
-                    self.text.append(line)
-                self.current_line = []
+        if tag in BLOCK_TAGS:
+            self._end_line()
+        elif tag in CELL_TAGS:
+            self._end_cell()
     
-    def get_text(self):
+    def _end_cell(self):
+        if self.current_cell:
+            self.current_line.append(' '.join(self.current_cell))
+            self.current_cell = []
+    
+    def _end_line(self):
+        self._end_cell()
         if self.current_line:
-            line = ' '.join(self.current_line).strip()
-            if line:
-                self.text.append(line)
-        return '\n'.join(self.text)
+            self.lines.append(('\t' if self.keep_lines else ' ').join(self.current_line))
+            self.current_line = []
+    
+    def get_text(self):
+        self._end_line()
+        return ('\n' if self.keep_lines else ' ').join(self.lines)
 
 
 def clean_text(text: str) -> str:
@@ -55,28 +112,16 @@ def clean_text(text: str) -> str:
     return text
 
 
-def html_to_text(html_content: str) -> str:
+def html_to_text(html_content: str, keep_lines: bool = False, max_chars: int = 0) -> str:
     if not html_content:
         return ""
     
-    html_content = html.unescape(html_content)
-    
-    html_content = re.sub(r'<style[^>]*>.*?</style>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
-    html_content = re.sub(r'<script[^>]*>.*?</script>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
-    html_content = re.sub(r'<noscript[^>]*>.*?</noscript>', '', html_content, flags=re.DOTALL | re.IGNORECASE)
-    
-    parser = HTMLTextExtractor()
+    parser = HTMLTextExtractor(keep_lines=keep_lines, max_chars=max_chars)
     try:
         parser.feed(html_content)
-        text = parser.get_text()
-    except:
-        text = re.sub(r'<[^>]+>', ' ', html_content)
-    
-    text = re.sub(r'\n\s*\n', '\n', text)
-    text = re.sub(r'[ \t]+', ' ', text)
-    text = clean_text(text)
-    
-    return text
+    except TextLimitReached:
+        pass
+    return parser.get_text()
 
 
 def truncate_text(text: str, max_length: int = 100) -> str:
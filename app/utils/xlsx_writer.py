@@ -0,0 +1,107 @@
+import re
+import math
+import shutil
+import tempfile
+import zipfile
+from typing import Any, BinaryIO, Iterable, List
+from xml.sax.saxutils import escape
+
+_ILLEGAL_XML_RE = re.compile('[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Override PartName="/xl/workbook.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+    '<Override PartName="/xl/worksheets/sheet1.xml" '
+    'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+    '</Types>'
+)
+
+ROOT_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+    'Target="xl/workbook.xml"/>'
+    '</Relationships>'
+)
+
+WORKBOOK_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" '
+    'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+    'Target="worksheets/sheet1.xml"/>'
+    '</Relationships>'
+)
+
+SHEET_HEADER = (
+    b'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    b'<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+)
+SHEET_FOOTER = b'</sheetData></worksheet>'
+
+
+def column_letter(index: int) -> str:
+    letters = ""
+    index += 1
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+
+def _cell(reference: str, value: Any) -> str:
+    if value is None or value == "":
+        return ""
+    if isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value):
+        return f'<c r="{reference}"><v>{value!r}</v></c>'
+    text = escape(_ILLEGAL_XML_RE.sub('', str(value)))
+    return f'<c r="{reference}" t="inlineStr"><is><t xml:space="preserve">{text}</t></is></c>'
+
+
+class XLSXWriter:
+    def __init__(self, sheet_name: str = "Hoja1"):
+        self.sheet_name = escape(sheet_name[:31], {'"': '&quot;'})
+        self.rows = 0
+        self._columns: List[str] = []
+        self._sheet = tempfile.TemporaryFile()
+
+    def write_row(self, values: Iterable[Any]):
+        self.rows += 1
+        cells = []
+        for index, value in enumerate(values):
+            if index >= len(self._columns):
+                self._columns.append(column_letter(index))
+            cells.append(_cell(f"{self._columns[index]}{self.rows}", value))
+        self._sheet.write(f'<row r="{self.rows}">{"".join(cells)}</row>'.encode('utf-8'))
+
+    def save(self, fileobj: BinaryIO):
+        workbook = (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{self.sheet_name}" sheetId="1" r:id="rId1"/></sheets></workbook>'
+        )
+        with zipfile.ZipFile(fileobj, 'w', zipfile.ZIP_DEFLATED) as package:
+            package.writestr('[Content_Types].xml', CONTENT_TYPES)
+            package.writestr('_rels/.rels', ROOT_RELS)
+            package.writestr('xl/workbook.xml', workbook)
+            package.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+            with package.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+                sheet.write(SHEET_HEADER)
+                self._sheet.seek(0)
+                shutil.copyfileobj(self._sheet, sheet)
+                sheet.write(SHEET_FOOTER)
+
+    def close(self):
+        self._sheet.close()
+
+    def __enter__(self) -> "XLSXWriter":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
@@ -0,0 +1,46 @@
+import sys
+import argparse
+from pathlib import Path
+
+app_dir = Path(__file__).parent / 'app'
+if app_dir.exists():
+    sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.backfill_service import BackfillService
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Clasifica todos los correos de una busqueda de Gmail")
+    parser.add_argument('--query', default="", help="busqueda de Gmail, por ejemplo 'has:attachment after:2020/01/01'")
+    parser.add_argument('--workers', type=int, default=0, help="correos procesados en paralelo")
+    parser.add_argument('--page-size', type=int, default=0, help="ids por pagina de messages.list (maximo 500)")
+    parser.add_argument('--max-messages', type=int, default=0, help="detenerse despues de N correos")
+    parser.add_argument('--checkpoint', default=None, help="archivo de checkpoint")
+    parser.add_argument('--no-labels', action='store_true', help="solo extraer, sin aplicar etiquetas")
+    parser.add_argument('--reset', action='store_true', help="ignorar el checkpoint guardado y empezar de cero")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        state = BackfillService(args.checkpoint).run(
+            args.query,
+            workers=args.workers,
+            page_size=args.page_size,
+            max_messages=args.max_messages,
+            apply_labels=not args.no_labels,
+            reset=args.reset
+        )
+        exit(0 if state['failed'] == 0 else 2)
+    except KeyboardInterrupt:
+        print("Ejecuta el mismo comando para continuar desde el checkpoint")
+        exit(130)
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
@@ -0,0 +1,39 @@
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.corpus import make_documents
+from benchmarks.legacy import LegacyClassificationService
+from app.services.classification_service import ClassificationService
+
+
+def _bench(classify, documents, rounds: int) -> float:
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for subject, body, pdf_text in documents:
+            classify(subject, body, pdf_text)
+    return (len(documents) * rounds) / (time.perf_counter() - start)
+
+
+if __name__ == '__main__':
+    documents = make_documents()
+    legacy = LegacyClassificationService()
+    current = ClassificationService()
+
+    mismatches = [
+        doc[0] for doc in documents
+        if legacy.classify_document(*doc) != current.classify_document(*doc)
+    ]
+    if mismatches:
+        print(f"Resultados distintos en {len(mismatches)} documentos: {mismatches[:5]}")
+        exit(1)
+
+    rounds = 5
+    before = _bench(legacy.classify_document, documents, rounds)
+    after = _bench(current.classify_document, documents, rounds)
+    total_chars = sum(len(pdf) for _, _, pdf in documents)
+    print(f"Corpus: {len(documents)} documentos, {total_chars / 1e6:.1f} MB de texto PDF")
+    print(f"Antes:   {before:10.1f} documentos/s")
+    print(f"Después: {after:10.1f} documentos/s  ({after / before:.2f}x)")
@@ -0,0 +1,70 @@
+import sys
+import json
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.corpus import make_documents
+from benchmarks.legacy import LegacyClassificationService
+from benchmarks.bench_products import EDGE_CASES
+from app.services.classification_service import ClassificationService
+from app.services.document_features import DocumentFeatures
+
+
+def _legacy_document(service, subject, body, pdf_texts, body_lines):
+    pdf_combined = ' '.join(pdf_texts)
+    productos = []
+    for pdf_text in pdf_texts:
+        productos.extend(service.extract_products_from_text(pdf_text))
+    productos.extend(service.extract_products_from_text(body_lines))
+    return {
+        "tipo_documento": service.classify_document(subject, body, pdf_combined),
+        "productos": productos,
+        "totales": service.extract_totals_from_text(f"{subject} {body} {pdf_combined}")
+    }
+
+
+def _features_document(service, subject, body, pdf_texts, body_lines):
+    features = DocumentFeatures(subject, body, pdf_texts, body_lines)
+    productos = []
+    for pdf_features in features.pdf_features:
+        productos.extend(service.extract_products_from_features(pdf_features))
+    productos.extend(service.extract_products_from_features(features.body_line_features))
+    return {
+        "tipo_documento": service.classify_features(features),
+        "productos": productos,
+        "totales": service.extract_totals_from_features(features)
+    }
+
+
+def _run(process, service, documents):
+    return [json.dumps(process(service, *document), ensure_ascii=False) for document in documents]
+
+
+if __name__ == '__main__':
+    documents = [
+        (subject, body, [pdf_text] if pdf_text else [], body)
+        for subject, body, pdf_text in make_documents()
+    ]
+    documents += [("Cotización", edge_case, [edge_case, edge_case.upper()], edge_case) for edge_case in EDGE_CASES]
+    legacy = LegacyClassificationService()
+    current = ClassificationService()
+
+    golden = _run(_legacy_document, legacy, documents)
+    output = _run(_features_document, current, documents)
+    if golden != output:
+        mismatches = [i for i, (a, b) in enumerate(zip(golden, output)) if a != b]
+        print(f"Salida distinta en {len(mismatches)} documentos: {mismatches[:5]}")
+        exit(1)
+
+    timings = {}
+    for name, process, service in (("Antes", _legacy_document, legacy), ("Después", _features_document, current)):
+        start = time.perf_counter()
+        _run(process, service, documents)
+        timings[name] = len(documents) / (time.perf_counter() - start)
+
+    total_chars = sum(len(pdf_text) for _, _, pdf_texts, _ in documents for pdf_text in pdf_texts)
+    print(f"Corpus: {len(documents)} documentos, {total_chars / 1e6:.1f} MB de texto PDF (salida idéntica)")
+    print(f"Antes:   {timings['Antes']:10.1f} documentos/s")
+    print(f"Después: {timings['Después']:10.1f} documentos/s  ({timings['Después'] / timings['Antes']:.2f}x)")
@@ -0,0 +1,62 @@
+import sys
+import time
+import random
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.corpus import make_html
+from benchmarks.legacy import legacy_html_to_text
+from app.utils.text_utils import html_to_text
+
+
+def _measure(func, documents, rounds: int = 3):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for document in documents:
+            func(document)
+    elapsed = time.perf_counter() - start
+    throughput = rounds * sum(len(document) for document in documents) / elapsed / 1e6
+
+    tracemalloc.start()
+    peaks = []
+    for document in documents:
+        tracemalloc.reset_peak()
+        func(document)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return throughput, max(peaks)
+
+
+if __name__ == '__main__':
+    rng = random.Random(42)
+    documents = [make_html(rng, size) for size in (50_000, 500_000, 1_000_000, 2_000_000)]
+
+    for document in documents:
+        if legacy_html_to_text(document) != html_to_text(document):
+            print("El texto difiere de la implementación original")
+            exit(1)
+
+    malformed = {
+        "etiquetas sin cerrar": "<a " * 20000,
+        "declaraciones sin cerrar": "<!x " * 20000,
+        "atributos con comillas sin cerrar": '<a href="' * 20000,
+    }
+    for name, document in malformed.items():
+        start = time.perf_counter()
+        html_to_text(document)
+        elapsed = time.perf_counter() - start
+        print(f"HTML malformado ({name}, {len(document) // 1000} KB): {elapsed:.3f} s")
+        if elapsed > 1.0:
+            print("El HTML malformado tarda demasiado; revisa el escaneo de etiquetas")
+            exit(1)
+
+    for name, func in (
+        ("Antes (unescape + regex + HTMLParser)", legacy_html_to_text),
+        ("Después (un solo paso)", html_to_text),
+        ("Después, conservando líneas", lambda document: html_to_text(document, keep_lines=True)),
+        ("Después, límite de 100k caracteres", lambda document: html_to_text(document, max_chars=100_000)),
+    ):
+        throughput, peak = _measure(func, documents)
+        print(f"{name:40s} {throughput:6.1f} MB/s, pico {peak / 1e6:6.1f} MB")
@@ -0,0 +1,52 @@
+import sys
+import time
+import importlib.util
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.pdf_fixtures import make_pdf
+from app.services.pdf_document import ParsedPDF
+from app.services.pdf_service import _extract_pdf_content
+from benchmarks.legacy import legacy_process_pdf
+
+
+def _measure(func, documents, rounds: int = 3):
+    start = time.process_time()
+    for _ in range(rounds):
+        for pdf_data in documents:
+            func(pdf_data)
+    cpu = (time.process_time() - start) / (rounds * len(documents))
+
+    tracemalloc.start()
+    peaks = []
+    for pdf_data in documents:
+        tracemalloc.reset_peak()
+        func(pdf_data)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+    tracemalloc.stop()
+    return cpu, max(peaks)
+
+
+if __name__ == '__main__':
+    documents = [make_pdf(pages, seed=pages) for pages in (1, 2, 5, 10, 20)]
+    for pdf_data in documents:
+        _extract_pdf_content(pdf_data)
+
+    if importlib.util.find_spec("PyPDF2"):
+        for pdf_data in documents:
+            if legacy_process_pdf(pdf_data) != _extract_pdf_content(pdf_data):
+                print("El texto o los metadatos difieren de la implementación original")
+                exit(1)
+        cpu, peak = _measure(legacy_process_pdf, documents)
+        print(f"Antes (pdfminer + PyPDF2): {cpu * 1000:8.1f} ms CPU/adjunto, pico {peak / 1e6:6.1f} MB")
+    else:
+        print("PyPDF2 no está instalado; se omite la medición de la implementación original")
+
+    cpu, peak = _measure(_extract_pdf_content, documents)
+    print(f"Después (un solo parseo):  {cpu * 1000:8.1f} ms CPU/adjunto, pico {peak / 1e6:6.1f} MB")
+    cpu, peak = _measure(lambda data: _extract_pdf_content(data, include_metadata=False), documents)
+    print(f"Después, solo texto:       {cpu * 1000:8.1f} ms CPU/adjunto, pico {peak / 1e6:6.1f} MB")
+    cpu, peak = _measure(lambda data: ParsedPDF(data).metadata, documents)
+    print(f"Después, solo metadatos:   {cpu * 1000:8.1f} ms CPU/adjunto, pico {peak / 1e6:6.1f} MB")
@@ -0,0 +1,63 @@
+import sys
+import json
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from benchmarks.corpus import make_documents
+from benchmarks.legacy import LegacyClassificationService
+from app.services.classification_service import ClassificationService
+
+
+EDGE_CASES = [
+    "Item    Qty    Price    Total\n---\nWidget grande    1,200    3,500.50    4,200,600.00\nSubtotal 10",
+    "- Tornillos 10 0.5\n* Tuercas: 5 2\n> Arandelas , , 3",
+    "Cable UTP\nQty: 3 Price: $4.50\nQty 2 Unit 7",
+    "12345 67890 111\nAB 1 2\nabc: 12 34\nNo. 5 6 7",
+    "Producto | Cantidad | Precio\nMartillo | 2 | 15.00\n____\nTotal | 30",
+    "Válvula ٣ ٤\n\tTabulado\t4\t5\t20",
+]
+
+OVERFLOW_CASE = "Widget " + "9" * 400 + " 5"
+
+
+def _error_type(service, text):
+    try:
+        service.extract_products_from_text(text)
+    except Exception as e:
+        return type(e)
+    return None
+
+
+def _run(service, texts):
+    return [service.extract_products_from_text(text) for text in texts]
+
+
+if __name__ == '__main__':
+    documents = make_documents(count=60, min_pages=10, max_pages=50)
+    texts = [pdf for _, _, pdf in documents if pdf] + [body for _, body, _ in documents] + EDGE_CASES
+    legacy = LegacyClassificationService()
+    current = ClassificationService()
+
+    golden = [json.dumps(result, ensure_ascii=False) for result in _run(legacy, texts)]
+    output = [json.dumps(result, ensure_ascii=False) for result in _run(current, texts)]
+    if golden != output:
+        mismatches = [i for i, (a, b) in enumerate(zip(golden, output)) if a != b]
+        print(f"Salida distinta en {len(mismatches)} textos: {mismatches[:5]}")
+        exit(1)
+
+    if _error_type(legacy, OVERFLOW_CASE) != _error_type(current, OVERFLOW_CASE):
+        print("Comportamiento distinto ante números fuera de rango")
+        exit(1)
+
+    total_lines = sum(text.count('\n') + 1 for text in texts)
+    timings = {}
+    for name, service in (("Antes", legacy), ("Después", current)):
+        start = time.perf_counter()
+        _run(service, texts)
+        timings[name] = total_lines / (time.perf_counter() - start)
+
+    print(f"Corpus: {len(texts)} textos, {total_lines} líneas (salida idéntica)")
+    print(f"Antes:   {timings['Antes']:12.0f} líneas/s")
+    print(f"Después: {timings['Después']:12.0f} líneas/s  ({timings['Después'] / timings['Antes']:.2f}x)")
@@ -0,0 +1,104 @@
+import random
+from typing import List, Tuple
+
+
+SUBJECTS = [
+    "Purchase Order 4512 - Acme Corp",
+    "PO-7781 confirmación",
+    "Solicito cotización de materiales",
+    "Please quote the attached list",
+    "RE: pedido semanal",
+    "Invoice and shipping details",
+    "Quote request for Q3",
+    "Orden de compra #991",
+]
+
+BODIES = [
+    "Hola, adjunto la orden de compra con los productos solicitados. Saludos.",
+    "Could you send me a quote for the following items? Thank you.",
+    "Please confirm the delivery date for the attached order 5521.",
+    "Necesito confirmar precios para el siguiente pedido.",
+    "Buen día, quedo atento a sus comentarios.",
+]
+
+PRODUCT_NAMES = [
+    "Tornillo hexagonal 1/4", "Steel bracket large", "Cable UTP Cat6", "Office chair ergonomic",
+    "Guantes de nitrilo", "Printer toner black", "Válvula de bola 2in", "LED panel 60x60",
+]
+
+HEADER_LINES = [
+    "Item | Description | Qty | Unit Price | Total",
+    "Producto    Cantidad    Precio    Total",
+    "Descripción\tCantidad\tPrecio unitario\tTotal",
+]
+
+METADATA_LINES = [
+    "PO Number: 4512", "Date: 2024-03-01", "Phone: +1 555 123 4567", "Email: buyer@example.com",
+    "Ship to: Warehouse 3", "Payment terms: Net 30", "Vendor: Acme Corp", "Fecha: 12 de marzo",
+]
+
+
+def _product_line(rng: random.Random) -> str:
+    name = rng.choice(PRODUCT_NAMES)
+    qty = rng.randint(1, 500)
+    price = round(rng.uniform(0.5, 2500), 2)
+    total = round(qty * price, 2)
+    style = rng.randint(0, 3)
+    if style == 0:
+        return f"{name} | {qty} | ${price:,.2f} | ${total:,.2f}"
+    if style == 1:
+        return f"{name}    {qty}    {price}    {total}"
+    if style == 2:
+        return f"- {name} {qty} {price}"
+    return f"{name} Qty: {qty} Price: ${price}"
+
+
+def make_pdf_text(rng: random.Random, pages: int, lines_per_page: int = 45) -> str:
+    page_texts = []
+    for page in range(pages):
+        lines = [rng.choice(METADATA_LINES) for _ in range(4)]
+        lines.append(rng.choice(HEADER_LINES))
+        lines.append("-" * 40)
+        for _ in range(lines_per_page):
+            lines.append(_product_line(rng))
+        lines.append(f"Subtotal: {rng.randint(100, 90000)}.00")
+        lines.append(f"Total: USD {rng.randint(100, 90000)}.00")
+        lines.append(f"Página {page + 1} de {pages}")
+        page_texts.append("\n".join(lines))
+    return "\n\f".join(page_texts)
+
+
+def make_documents(count: int = 200, min_pages: int = 1, max_pages: int = 20, seed: int = 1234) -> List[Tuple[str, str, str]]:
+    rng = random.Random(seed)
+    documents = []
+    for _ in range(count):
+        subject = rng.choice(SUBJECTS)
+        body = rng.choice(BODIES)
+        pdf_text = make_pdf_text(rng, rng.randint(min_pages, max_pages)) if rng.random() < 0.85 else ""
+        documents.append((subject, body, pdf_text))
+    return documents
+
+
+def make_html(rng: random.Random, target_bytes: int) -> str:
+    style = "<style>" + "".join(f".c{i}{{color:#{i:06x};padding:{i % 9}px}}" for i in range(400)) + "</style>"
+    script = "<script>var tracking = {" + ",".join(f'"k{i}": "<td>{i}</td>"' for i in range(300)) + "};</script>"
+    chunks = ["<!DOCTYPE html><html><head><title>Newsletter</title>", style, script, "</head><body>"]
+    size = sum(len(chunk) for chunk in chunks)
+    while size < target_bytes:
+        rows = "".join(
+            f'<tr class="c{rng.randint(0, 399)}"><td>{rng.choice(PRODUCT_NAMES)} &amp; Co.</td>'
+            f'<td align="right">{rng.randint(1, 500)}</td><td>&#36;{rng.uniform(0.5, 2500):,.2f}</td></tr>'
+            for _ in range(20)
+        )
+        block = (
+            f'<div class="c{rng.randint(0, 399)}"><h2>{rng.choice(SUBJECTS)}</h2>'
+            f'<p>{rng.choice(BODIES)}&nbsp;&mdash; {rng.choice(METADATA_LINES)}<br/>'
+            f'<a href="https://example.com/{rng.randint(0, 10 ** 9)}">Ver en el navegador</a></p>'
+            f'<table><tbody>{rows}</tbody></table>'
+            f'<noscript><img src="https://example.com/pixel.gif"></noscript>'
+            f'<ul><li>{rng.choice(METADATA_LINES)}</li><li>{rng.choice(BODIES)}</li></ul></div>'
+        )
+        chunks.append(block)
+        size += len(block)
+    chunks.append("</body></html>")
+    return "".join(chunks)
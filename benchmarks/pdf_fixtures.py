@@ -0,0 +1,60 @@
+import random
+from typing import List
+
+from benchmarks.corpus import make_pdf_text
+
+
+def _escape(text: str) -> str:
+    return text.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def build_pdf(pages: List[List[str]], title: str = "Benchmark") -> bytes:
+    objects = []
+    page_ids = []
+    font_id = 3
+    next_id = 4
+    page_objects = []
+    for lines in pages:
+        content_id, page_id = next_id, next_id + 1
+        next_id += 2
+        page_ids.append(page_id)
+        commands = ["BT", "/F1 9 Tf", "11 TL", "40 800 Td"]
+        for line in lines:
+            text = line.encode('latin-1', errors='replace').decode('latin-1')
+            commands.append(f"({_escape(text)}) Tj T*")
+        commands.append("ET")
+        stream = "\n".join(commands).encode('latin-1')
+        page_objects.append((content_id, b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"))
+        page_objects.append((page_id, (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 {font_id} 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode('latin-1')))
+
+    info_id = next_id
+    objects.append((1, b"<< /Type /Catalog /Pages 2 0 R >>"))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.append((2, f"<< /Type /Pages /Kids [{kids}] /Count {len(page_ids)} >>".encode('latin-1')))
+    objects.append((font_id, b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"))
+    objects.extend(page_objects)
+    objects.append((info_id, f"<< /Title ({_escape(title)}) /Producer (benchmarks) /CreationDate (D:20240101000000Z) >>".encode('latin-1')))
+    objects.sort()
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id, body in objects:
+        offsets[obj_id] = len(output)
+        output += f"{obj_id} 0 obj\n".encode('latin-1') + body + b"\nendobj\n"
+
+    xref_offset = len(output)
+    output += f"xref\n0 {info_id + 1}\n".encode('latin-1')
+    output += b"0000000000 65535 f \n"
+    for obj_id in range(1, info_id + 1):
+        output += f"{offsets[obj_id]:010d} 00000 n \n".encode('latin-1')
+    output += f"trailer\n<< /Size {info_id + 1} /Root 1 0 R /Info {info_id} 0 R >>\nstartxref\n{xref_offset}\n%%EOF\n".encode('latin-1')
+    return bytes(output)
+
+
+def make_pdf(pages: int, seed: int = 7, title: str = "Purchase Order") -> bytes:
+    rng = random.Random(seed)
+    text = make_pdf_text(rng, pages, lines_per_page=60)
+    return build_pdf([page.split('\n') for page in text.split('\n\f')], title=title)
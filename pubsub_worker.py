@@ -0,0 +1,21 @@
+import sys
+from pathlib import Path
+
+app_dir = Path(__file__).parent / 'app'
+if app_dir.exists():
+    sys.path.insert(0, str(Path(__file__).parent))
+
+from app.services.pubsub_worker import get_pubsub_worker
+
+
+if __name__ == '__main__':
+    try:
+        get_pubsub_worker().run_forever()
+    except ValueError as e:
+        print(f"Error: {e}")
+        exit(1)
+    except Exception as e:
+        print(f"Error: {e}")
+        import traceback
+        traceback.print_exc()
+        exit(1)
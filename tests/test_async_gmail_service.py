@@ -0,0 +1,153 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services.async_gmail_service import AsyncGmailError, AsyncGmailService
+from app.services.message_cache import MessageCache
+from app.services.quota_scheduler import QuotaScheduler
+
+
+class FakeCredentials:
+    def __init__(self, token: str):
+        self.token = token
+        self.valid = True
+        self.refresh_token = "refresh"
+
+
+class FakeGmailService:
+    def __init__(self, token: str = "token-1"):
+        self.creds = FakeCredentials(token)
+        self.message_cache = MessageCache(1024 * 1024)
+        self.refreshed = []
+
+    def load_credentials(self) -> bool:
+        return True
+
+    def refresh_credentials(self, stale_token=None) -> bool:
+        self.refreshed.append(stale_token)
+        self.creds.token = "token-2"
+        return True
+
+
+def make_service(monkeypatch, handler) -> AsyncGmailService:
+    service = AsyncGmailService()
+    service.gmail_service = FakeGmailService()
+    service.quota = QuotaScheduler(10000, 10000, max_retries=3, backoff_base=0.01, backoff_max=0.02)
+    monkeypatch.setattr(service, "_create_client", lambda: httpx.AsyncClient(
+        base_url="https://gmail.test", transport=httpx.MockTransport(handler)
+    ))
+    return service
+
+
+def test_get_messages_json_fetches_unique_ids_and_reports_errors(monkeypatch):
+    requested = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        message_id = request.url.path.rsplit('/', 1)[-1]
+        requested.append(message_id)
+        assert request.headers["Authorization"] == "Bearer token-1"
+        assert request.url.params["format"] == "metadata"
+        if message_id == "missing":
+            return httpx.Response(404, json={"error": {"message": "Not Found"}})
+        return httpx.Response(200, json={"id": message_id, "historyId": "10"})
+
+    service = make_service(monkeypatch, handler)
+
+    async def run():
+        first = await service.get_messages_json(["a", "b", "a", "missing"], format="metadata")
+        second = await service.get_messages_json(["a", "b"], format="metadata")
+        await service.close()
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert sorted(requested) == ["a", "b", "missing"]
+    assert list(first) == ["a", "b", "missing"]
+    assert first["a"] == {"response": {"id": "a", "historyId": "10"}}
+    assert "404" in first["missing"]["error"]
+    assert second["b"] == {"response": {"id": "b", "historyId": "10"}}
+
+
+def test_request_retries_after_rate_limit(monkeypatch):
+    statuses = [429, 429, 200]
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        status = statuses.pop(0)
+        if status == 429:
+            return httpx.Response(429, json={"error": {"message": "Rate Limit Exceeded"}})
+        return httpx.Response(200, json={"emailAddress": "user@example.com"})
+
+    service = make_service(monkeypatch, handler)
+
+    async def run():
+        profile = await service.get_profile()
+        await service.close()
+        return profile
+
+    assert asyncio.run(run()) == {"emailAddress": "user@example.com"}
+    assert statuses == []
+    assert service.quota.throttled == 2
+
+
+def test_request_raises_when_rate_limit_persists(monkeypatch):
+    calls = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        calls.append(request)
+        return httpx.Response(429, json={"error": {"message": "Rate Limit Exceeded"}})
+
+    service = make_service(monkeypatch, handler)
+
+    async def run():
+        try:
+            await service.get_profile()
+        finally:
+            await service.close()
+
+    with pytest.raises(AsyncGmailError) as error:
+        asyncio.run(run())
+    assert error.value.status_code == 429
+    assert len(calls) == service.quota.max_retries + 1
+
+
+def test_request_refreshes_token_after_unauthorized(monkeypatch):
+    tokens = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        token = request.headers["Authorization"].split(" ", 1)[1]
+        tokens.append(token)
+        if token == "token-1":
+            return httpx.Response(401, json={"error": {"message": "Invalid Credentials"}})
+        return httpx.Response(200, json={"labels": [{"id": "INBOX"}]})
+
+    service = make_service(monkeypatch, handler)
+
+    async def run():
+        labels = await service.list_labels()
+        await service.close()
+        return labels
+
+    assert asyncio.run(run()) == [{"id": "INBOX"}]
+    assert tokens == ["token-1", "token-2"]
+    assert service.gmail_service.refreshed == ["token-1"]
+
+
+def test_service_can_be_used_from_several_event_loops(monkeypatch):
+    def handler(request: httpx.Request) -> httpx.Response:
+        return httpx.Response(200, json={"id": request.url.path.rsplit('/', 1)[-1]})
+
+    service = make_service(monkeypatch, handler)
+    monkeypatch.setattr(service.settings, "GMAIL_ASYNC_MAX_CONCURRENCY", 1)
+
+    async def run():
+        results = await service.get_messages_json([f"m{i}" for i in range(5)], format="minimal")
+        await service.close()
+        return results
+
+    first = asyncio.run(run())
+    service.gmail_service.message_cache.invalidate(list(first))
+    second = asyncio.run(run())
+
+    assert first == second
+    assert all("response" in result for result in second.values())
@@ -0,0 +1,130 @@
+import json
+
+import pytest
+
+from app.services import pubsub_worker
+from app.services.pubsub_worker import GmailPubSubWorker
+
+
+class FakeMessage:
+    def __init__(self, data: bytes, message_id: str = "1", delivery_attempt=None):
+        self.data = data
+        self.message_id = message_id
+        self.delivery_attempt = delivery_attempt
+        self.acked = 0
+        self.nacked = 0
+
+    def ack(self):
+        self.acked += 1
+
+    def nack(self):
+        self.nacked += 1
+
+
+class FakeProcessingService:
+    def __init__(self, outcome=None, error: Exception = None):
+        self.outcome = outcome
+        self.error = error
+        self.calls = 0
+
+    def process_new_messages(self):
+        self.calls += 1
+        if self.error:
+            raise self.error
+        return self.outcome
+
+
+def notification(history_id: str = "100") -> bytes:
+    return json.dumps({"emailAddress": "user@example.com", "historyId": history_id}).encode('utf-8')
+
+
+def outcome(results=None, errors=None, retry=None):
+    results = results or {}
+    errors = errors or {}
+    return {
+        "message_ids": list(results) + list(errors),
+        "results": results,
+        "errors": errors,
+        "retry": retry or [],
+    }
+
+
+@pytest.fixture
+def make_worker(monkeypatch):
+    def make(processing_service: FakeProcessingService, max_attempts: int = 5) -> GmailPubSubWorker:
+        monkeypatch.setattr(pubsub_worker, "get_gmail_service", lambda: None)
+        monkeypatch.setattr(pubsub_worker, "get_processing_service", lambda: processing_service)
+        worker = GmailPubSubWorker()
+        monkeypatch.setattr(worker.settings, "GMAIL_PUBSUB_MAX_DELIVERY_ATTEMPTS", max_attempts)
+        return worker
+    return make
+
+
+def test_callback_acks_when_all_messages_are_processed(make_worker):
+    worker = make_worker(FakeProcessingService(outcome(results={"m1": {"label": "PO"}})))
+    message = FakeMessage(notification())
+
+    worker._callback(message)
+
+    assert (message.acked, message.nacked) == (1, 0)
+
+
+def test_callback_acks_when_errors_are_not_retryable(make_worker):
+    worker = make_worker(FakeProcessingService(outcome(errors={"m1": "Mensaje no encontrado"})))
+    message = FakeMessage(notification())
+
+    worker._callback(message)
+
+    assert (message.acked, message.nacked) == (1, 0)
+
+
+def test_callback_nacks_when_messages_should_be_retried(make_worker):
+    worker = make_worker(FakeProcessingService(outcome(errors={"m1": "timeout"}, retry=["m1"])))
+    message = FakeMessage(notification())
+
+    worker._callback(message)
+
+    assert (message.acked, message.nacked) == (0, 1)
+
+
+def test_callback_nacks_when_processing_raises(make_worker):
+    worker = make_worker(FakeProcessingService(error=RuntimeError("sin conexión")))
+    message = FakeMessage(notification())
+
+    worker._callback(message)
+
+    assert (message.acked, message.nacked) == (0, 1)
+
+
+def test_callback_acks_invalid_payload_without_processing(make_worker):
+    processing_service = FakeProcessingService(outcome())
+    worker = make_worker(processing_service)
+    message = FakeMessage(b"{no es json")
+
+    worker._callback(message)
+
+    assert (message.acked, message.nacked) == (1, 0)
+    assert processing_service.calls == 0
+
+
+def test_callback_acks_once_delivery_limit_is_reached(make_worker):
+    worker = make_worker(FakeProcessingService(outcome(errors={"m1": "timeout"}, retry=["m1"])), max_attempts=3)
+
+    below_limit = FakeMessage(notification(), delivery_attempt=2)
+    worker._callback(below_limit)
+    at_limit = FakeMessage(notification(), delivery_attempt=3)
+    worker._callback(at_limit)
+
+    assert (below_limit.acked, below_limit.nacked) == (0, 1)
+    assert (at_limit.acked, at_limit.nacked) == (1, 0)
+
+
+def test_callback_counts_redeliveries_without_dead_letter_policy(make_worker):
+    worker = make_worker(FakeProcessingService(outcome(errors={"m1": "timeout"}, retry=["m1"])), max_attempts=3)
+    message = FakeMessage(notification(), message_id="42")
+
+    for _ in range(3):
+        worker._callback(message)
+
+    assert (message.acked, message.nacked) == (1, 2)
+    assert worker._deliveries == {}